@@ -5,16 +5,43 @@ Polytechnique Montreal
 """
 
 from time import sleep
+import math
 import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib.animation as animation
-from scipy import interpolate
 import json
+#matplotlib and scipy are imported by the methods which use them, the
+#control loop only need numpy (fast start of a headless controller)
+from PID_scheduler import Rate_scheduler
+from PID_viewer import Live_viewer
+from PID_buffer import Run_buffer
+from PID_filter import sliding_avg
+from PID_metrics import step_metrics, Step_accumulator
+from PID_runfile import Run_writer, load_run, update_header, EXTENSION
+from PID_instrument import Loop_timer, WAIT, READ, COMPUTE, RECORD, WRITE, PUBLISH, STOP
+
+HOOK_EVENTS = ('pre_sample', 'post_sample', 'pre_actuate', 'post_iteration')
+
+
+
+def compile_hooks(hooks):
+    """
+    this function return None for no hook, the hook itself for one hook or a
+    function calling them in order, so the loop call at most one function
+    """
+    hooks = tuple(hooks)
+    if len(hooks) == 0:
+        return None
+    if len(hooks) == 1:
+        return hooks[0]
+    def chain(pid, i, buffer):
+        for hook in hooks:
+            hook(pid, i, buffer)
+    return chain
 
 
 
 class PID_LED():
-    def __init__(self, led, sensor, Ref, Kp, Ki = 0, Kd = 0, Ku = None, Tu = None):
+    def __init__(self, led, sensor, Ref, Kp, Ki = 0, Kd = 0, Ku = None, Tu = None, clock = None,\
+                    calibration = None):
         """
         Parameters
         ----------------------
@@ -32,6 +59,12 @@ class PID_LED():
             Ziegler-Nichols term.
         Tu: float
             Ziegler-Nichols term.
+        clock: object with sleep() and monotonic_ns() methods
+            clock used for waiting and timing, time module if None
+            (use the Virtual_clock of a simulated LED_plant)
+        calibration: Calibration_cache
+            reuse the background and maximum of the same led and sensor,
+            a full calibration at each apply() if None
         """
         #parameters
         self.led = led
@@ -42,6 +75,8 @@ class PID_LED():
         self.Ref = Ref
         self.Ku = Ku
         self.Tu = Tu
+        self.clock = clock
+        self.calibration = calibration
 
         #for PID loop
         self.background = 0
@@ -49,9 +84,13 @@ class PID_LED():
         self.previous_error = 0
         self.sum_error = 0
         self.present_out = 0
-        self.photoresistance = list()
-        self.out = list()
-        self.time = list()
+        self.buffer = None
+        self.metrics = None
+        self.sample = None
+        self.hooks = {event: [] for event in HOOK_EVENTS}
+        self.photoresistance = np.empty(0)
+        self.out = np.empty(0)
+        self.time = np.empty(0)
 
         #for analysis
         self.photoresistance_raw = None
@@ -63,70 +102,176 @@ class PID_LED():
         self.t_r = None
         self.t_s = None
         self.eps = None
+        self.timing = None
+        self.loop_timer = None
+        self.record = None
 
 
 
-    def apply(self, duration=120, delta_t=1, bin_size = 5, zn_tuning = False, live = True):
+    def wait(self, delay):
         """
-        This function excute the PID loop.
-
-        Parameters
-        ----------------------
-            Ref: float
-                target value of the controler
-            duration: float
-                recording duration
-            delta_t : float
-                time between recordings
-            bin_size : int
-                number of samples to average for each delta_t
-                use for real time ploting
-            zn_tuning: bool
-                using the Ziegler-Nichols tunning
-            live: bool
-                for real time ploting
+        this function wait with the clock of the controller
         """
+        if self.clock is None:
+            sleep(delay)
+        else:
+            self.clock.sleep(delay)
 
 
-        def calibrate():
-            """
-            this function measure the light background and maximum for 5s
-            """
+
+    def calibrate(self):
+        """
+        This function measure the light background and maximum for 5s each,
+        or take them from the calibration cache when still valid
+        """
+
+        def measure():
             self.led.value = 0
-            sleep(0.5)
+            self.wait(0.5)
             background = 0
             for i in range(10):
                 background += self.sensor.value
-                sleep(0.5)
+                self.wait(0.5)
             self.background = background/10 #mean value
 
 
             self.led.value = 1
-            sleep(0.5)
-            max = 0
+            self.wait(0.5)
+            readings = []
             for i in range(10):
-                max += self.sensor.value
-                sleep(0.5)
-            self.max = max/10 #mean value
+                readings.append(self.sensor.value)
+                self.wait(0.5)
+            self.max = sum(readings)/10 #mean value
 
             self.led.value =0
-            sleep(0.5)
+            self.wait(0.5)
+            return self.background, self.max, readings
 
+        if self.calibration is None:
+            measure()
+        else:
+            self.background, self.max = self.calibration.get(self.led, self.sensor,\
+                                                                measure, self.wait)
 
 
+
+    def register_hook(self, event, hook):
+        """
+        This function add a hook called by apply() at each iteration as
+        hook(self, i, self.buffer), the buffer columns are views of the run
+        (self.buffer['photoresistance'], ...). The hooks are read when apply()
+        start.
+
+        Parameters
+        ----------------------
+        event : str
+            'pre_sample': before the readings of iteration i
+            'post_sample': after the readings, self.sample is the normalized
+                reading used by the PID and can be replaced (filter)
+            'pre_actuate': after the PID update, self.present_out is the
+                output to be recorded and written and can be changed
+            'post_iteration': after the sample is recorded and published
+        hook : callable
+            hook(pid, i, buffer)
+
+        Returns
+        ----------------------
+        hook : callable
+            the registered hook
+        """
+        if event not in self.hooks:
+            raise ValueError("unknown hook event " + str(event) + ", use one of "\
+                                + ', '.join(HOOK_EVENTS))
+        self.hooks[event].append(hook)
+        return hook
+
+
+
+    def remove_hook(self, event, hook):
+        """
+        this function remove a hook added by register_hook
+        """
+        self.hooks[event].remove(hook)
+
+
+
+    def read_sensor(self, scheduler, bin_size, timer=None):
+        """
+        This function read bin_size samples on the ticks of the scheduler and
+        return the time of the first one and the normalized mean value
+        (the waits and the readings are timed by the Loop_timer if given)
+        """
+        photoresistance = 0
+        for j in range(bin_size):
+            t = scheduler.wait() #true time of the reading
+            if timer is not None:
+                timer.mark(WAIT)
+            if j == 0:
+                t_0 = t
+            photoresistance += self.sensor.value
+            if timer is not None:
+                timer.mark(READ)
+        photoresistance = photoresistance/bin_size #mean value
+        return t_0, (photoresistance - self.background)/(self.max-self.background)
+
+
+
+    def apply(self, duration=120, delta_t=1, bin_size = 5, zn_tuning = False, live = True,\
+                record = None, stop = None, history = True, instrument = None,\
+                flush_interval = 1, fsync = False):
+        """
+        This function excute the PID loop.
+
+        Parameters
+        ----------------------
+            Ref: float
+                target value of the controler
+            duration: float
+                recording duration, None for an endless run (ended by stop
+                or Ctrl-C, without live view)
+            delta_t : float
+                time between recordings
+            bin_size : int
+                number of samples to average for each delta_t (1 with a
+                PID_acquisition.Acquisition sensor, already filtered)
+                use for real time ploting
+            zn_tuning: bool
+                using the Ziegler-Nichols tunning, Ku and Tu are measured
+                with relay_tuning() if they are not defined
+            live: bool
+                for real time ploting
+            record: str
+                run file name (without extension) written during the run,
+                see load()
+            stop: callable
+                stop(self, i) is called after each iteration i, the run
+                end early when it return True
+            history: bool
+                keep all the samples in the buffer, otherwise only the last
+                one (bounded memory, the metrics are in self.metrics and
+                the samples in the record file)
+            instrument: bool or Loop_timer
+                time the phases of each iteration (see PID_instrument), the
+                summary is added to self.timing
+            flush_interval: float
+                maximal time between two writes of the record file in
+                seconds (the samples lost on a crash, the lag of a reader)
+            fsync: bool
+                force each write of the record file to the disk
+        """
+
         def execute_PID(i):
             """
             this code execute the PID control for iteration i
             """
-            self.time.append(i*self.delta_t)
-            photoresistance = 0
-            for j in range(bin_size):
-                photoresistance += self.sensor.value
-                sleep(self.delta_t/bin_size)
-            photoresistance = photoresistance/bin_size #mean value
-            photoresistance =(photoresistance - self.background)/(self.max-self.background)
+            if pre_sample is not None:
+                pre_sample(self, i, buffer)
+            t_i, photoresistance = self.read_sensor(scheduler, bin_size, timer)
+            if post_sample is not None:
+                self.sample = photoresistance
+                post_sample(self, i, buffer)
+                photoresistance = self.sample
             #print(photoresistance)
-            self.photoresistance.append(photoresistance)
             present_error = self.Ref - photoresistance
             self.sum_error += present_error
 
@@ -139,10 +284,23 @@ class PID_LED():
             self.present_out += P+I+D
             #limit the value between 0 and 1
             self.present_out = max(min(1, self.present_out ), 0)
-            self.out.append(self.present_out)
+            if pre_actuate is not None:
+                pre_actuate(self, i, buffer)
+            if timer is not None:
+                timer.mark(COMPUTE)
+            if not history:
+                buffer.clear()
+            buffer.append(t_i, photoresistance, self.present_out)
+            self.metrics.update(t_i, photoresistance)
+            if writer is not None:
+                writer.append(t_i, photoresistance, self.present_out)
+            if timer is not None:
+                timer.mark(RECORD)
             #update value
             self.led.value = self.present_out
             self.previous_error = present_error
+            if timer is not None:
+                timer.mark(WRITE)
 
 
 
@@ -151,64 +309,227 @@ class PID_LED():
         """
         self.duration = duration
         self.delta_t = delta_t
-        calibrate()
+        if duration is None and live:
+            raise ValueError("an endless run has no live view, use live=False")
+        self.calibrate()
+        n_samples = None if duration is None else int(duration/delta_t)+1
+        #the bin_size readings of each iteration are on a fixed grid
+        scheduler = Rate_scheduler(delta_t/bin_size, self.clock, (n_samples or 1024)*bin_size,\
+                                    ring=n_samples is None)
+        #samples are written in preallocated arrays
+        buffer = Run_buffer({'time': np.float64, 'photoresistance': np.float64,\
+                                'out': np.float64}, (n_samples or 1024) if history else 1)
+        self.buffer = buffer
+        #overshoot, rise and settling times and error integrals during the run
+        self.metrics = Step_accumulator(self.Ref, 0.025 if self.eps is None else self.eps,\
+                                        int(10/delta_t))
+        timer = instrument
+        if instrument is True:
+            timer = Loop_timer(capacity=n_samples or 1024, clock=self.clock,\
+                                ring=n_samples is None)
+        elif instrument is False:
+            timer = None
+        self.loop_timer = timer
+        #the hooks are compiled once, None when there is no hook
+        pre_sample, post_sample, pre_actuate, post_iteration =\
+            (compile_hooks(self.hooks[event]) for event in HOOK_EVENTS)
+        if zn_tuning and (self.Ku is None or self.Tu is None):
+            self.relay_tuning(delta_t=delta_t, bin_size=bin_size, calibrate=False)
         #activate Ziegler-Nichols tunning only if parameters are defined
         if zn_tuning and self.Ku is not None and self.Tu is not None:
             self.Kp = 0.6*self.Ku
             self.Ki = 1.2*self.Ku/self.Tu
             self.Kd = 3*self.Ku*self.Tu/40
 
-        #initiate axis for live plotting of data
-        # if live:
-        #     fig = plt.figure()
-        #     ax = fig.add_subplot(1, 1, 1)
-        #
-        #     def animate_PID(i):
-        #         execute_PID(i)
-        #         ax.scatter(self.time, self.photoresistance, c='r', s=5)
-        #         ax.plot([0, self.duration], [self.Ref, self.Ref], 'k--')
-        #         plt.axis([0, self.duration, 0, 1])
-        #         plt.title("PID controler with Kp = " + str(self.Kp) \
-        #             + ', ' + 'Ki = ' + str(self.Ki) + ' and Kd = ' + str(self.Kd))
-        #         plt.xlabel('Time (s)')
-        #         plt.ylabel('Amplitude')
-        #         plt.legend(['Target value'])
-        #         if i == int(self.duration/self.delta_t)+1:
-        #             print('end')
-        #
-        #             plt.close() #clear graph after
-        #
-        #
-        #     ani = animation.FuncAnimation(fig, animate_PID,\
-        #         frames = int(self.duration/self.delta_t)+2, interval=10,repeat = False)
-        #     plt.show()
-
+        #the samples are appended to the run file during the run
+        writer = None
+        self.record = None
+        if record is not None:
+            self.record = record + EXTENSION
+            writer = Run_writer(self.record, {'Ref': self.Ref, 'duration': duration,\
+                'delta_t': delta_t, 'bin_size': bin_size, 'Ku': self.Ku, 'Tu': self.Tu,\
+                'Kp': self.Kp, 'Ki': self.Ki, 'Kd': self.Kd, 'background': self.background,\
+                'max': self.max, 'eps': self.eps}, fsync=fsync, flush_interval=flush_interval,\
+                clock=self.clock)
+
+        #the live plot is drawn by another process, the loop only send samples
         if live:
-            plt.axis([0, self.duration, 0, 1])
-            plt.plot([0, self.duration], [self.Ref, self.Ref], 'k--')
-            plt.legend(['Target value'])
-            for i in range(int(duration/delta_t)+1):
-                execute_PID(i)
-                plt.scatter(i*self.delta_t, self.photoresistance[i], c='r', s=5)
-                plt.xlabel('Time (s)')
-                plt.ylabel('Amplitude')
-                plt.title("PID controler with Kp = " + str(self.Kp) \
-                    + ', ' + 'Ki = ' + str(self.Ki) + ' and Kd = ' + str(self.Kd))
-                plt.pause(0.1)
-                if i == int(duration/delta_t):
-                    print('end')
-            plt.show(block=False)
-            plt.clf() #clear graph after
-
-        else:
-            for i in range(int(duration/delta_t)+1):
+            viewer = Live_viewer(self.duration, self.Ref, "PID controler with Kp = "\
+                + str(self.Kp) + ', ' + 'Ki = ' + str(self.Ki) + ' and Kd = ' + str(self.Kd))
+            viewer.start()
+
+        try:
+            scheduler.start()
+            if timer is not None:
+                timer.start()
+            i = 0
+            while n_samples is None or i < n_samples:
                 execute_PID(i)
+                if live:
+                    viewer.publish(buffer.last('time'), buffer.last('photoresistance'),\
+                                    self.metrics.snapshot())
+                    if timer is not None:
+                        timer.mark(PUBLISH)
+                if post_iteration is not None:
+                    post_iteration(self, i, buffer)
+                stopped = stop is not None and stop(self, i)
+                if timer is not None:
+                    timer.mark(STOP)
+                    timer.end(scheduler.overruns)
+                if stopped:
+                    break
+                i += 1
+        finally:
+            #keep what was acquired even on Ctrl-C
+            if writer is not None:
+                writer.close()
+            if live:
+                print('end')
+                viewer.close()
+            if timer is not None and timer.export is not None:
+                timer.write()
+
+        self.timing = scheduler.report()
+        if timer is not None:
+            self.timing['phases'] = timer.summary()
+        if self.timing['overruns'] > 0:
+            print("Warning: " + str(self.timing['overruns']) + " readings were late, "\
+                + str(self.timing['skipped']) + " were skipped.")
+            if timer is not None:
+                timer.print_summary()
+
+        #raw data are views of the buffer, the processing functions do not
+        #modify their input so no copy is needed
+        self.photoresistance_raw = buffer['photoresistance']
+        self.out_raw = buffer['out']
+        self.time_raw = buffer['time']
+        self.photoresistance = self.photoresistance_raw
+        self.out = self.out_raw
+        self.time = self.time_raw
+
+
+
+
+    def relay_tuning(self, amplitude=0.02, hysteresis=0.01, delta_t=1, bin_size=5,\
+                        max_duration=120, tol=0.05, calibrate=True, cycles=5):
+        """
+        This function measure Ku and Tu with a relay experiment (Astrom-Hagglund).
+        As execute_PID increment the LED output, the relay switch the increment
+        between +amplitude and -amplitude around Ref, so Ku is the critical Kp
+        of execute_PID. For a limit cycle of amplitude a and period Tu
+            Ku = d/sqrt(a**2 - hysteresis**2)
+        where d is the first harmonic of the increments (4*amplitude/pi for a
+        symmetric relay). Tu is the mean period of the last cycles cycles
+        (switch times interpolated between the samples), a and d the first
+        harmonics of all their samples, so the noise of single samples
+        average out.
+        The experiment stop when two successive estimates agree within tol
+        (and delta_t for Tu).
 
-        #deep copy to preserve raw data
-        self.photoresistance_raw = self.photoresistance.copy()
-        self.out_raw = self.out.copy()
-        self.time_raw = self.time.copy()
-
+        Parameters
+        ----------------------
+            amplitude : float
+                increment of the LED output at each delta_t
+            hysteresis : float
+                dead band around Ref before switching, raised to 3 times the
+                noise of the readings measured before the experiment
+            delta_t : float
+                time between recordings
+            bin_size : int
+                number of samples to average for each delta_t
+            max_duration : float
+                maximal duration of the experiment
+            tol : float
+                relative tolerance of the convergence of Ku and Tu
+            calibrate : bool
+                calibrate before the experiment
+            cycles : int
+                number of cycles averaged by each estimate
+
+        Returns
+        ----------------------
+            Ku, Tu : float
+                also saved in self.Ku and self.Tu, None if no cycle was found
+        """
+        if calibrate:
+            self.calibrate()
+        n_noise = 20
+        n_max = int(max_duration/delta_t)+1
+        scheduler = Rate_scheduler(delta_t/bin_size, self.clock, (n_noise + n_max)*bin_size)
+        scheduler.start()
+
+        #noise of the readings with the LED off, from their differences once
+        #the light of the calibration has decayed
+        self.led.value = 0
+        dark = [self.read_sensor(scheduler, bin_size)[1] for k in range(n_noise)]
+        noise = np.std(np.diff(dark[n_noise//4:]))/math.sqrt(2)
+        hysteresis = max(hysteresis, 3*noise)
+
+        out = 0
+        direction = 1
+        time = np.empty(n_max)
+        y = np.empty(n_max)
+        relay = np.empty(n_max) #sign of the increment after each reading
+        switches = [] #interpolated time of the switches from rising to falling
+        estimates = []
+        converged = False
+        for i in range(n_max):
+            time[i], y[i] = self.read_sensor(scheduler, bin_size)
+            error = self.Ref - y[i]
+            if direction > 0 and error < -hysteresis:
+                direction = -1
+                level = self.Ref + hysteresis
+                if i > 0 and y[i] != y[i-1]:
+                    switches.append(time[i-1] + (level - y[i-1])/(y[i] - y[i-1])\
+                                    *(time[i] - time[i-1]))
+                else:
+                    switches.append(time[i])
+                #the first cycle is a transient
+                if len(switches) >= cycles + 2:
+                    estimates.append(self.relay_estimate(time[:i+1], y[:i+1], relay[:i+1],\
+                                        switches[-cycles-1:], amplitude, hysteresis))
+                if len(estimates) >= 2:
+                    (Ku_0, Tu_0), (Ku_1, Tu_1) = estimates[-2:]
+                    if abs(Ku_1 - Ku_0) <= tol*Ku_1\
+                            and abs(Tu_1 - Tu_0) <= max(tol*Tu_1, delta_t):
+                        converged = True
+                        break
+            elif direction < 0 and error > hysteresis:
+                direction = 1
+            relay[i] = direction
+            out = max(min(1, out + direction*amplitude), 0)
+            self.led.value = out
+
+        self.led.value = 0
+        self.wait(0.5)
+        if len(switches) < 3:
+            print("Relay tuning: no oscillation found.")
+            return None, None
+        if not converged:
+            #all the cycles after the transient
+            print("Relay tuning: not converged, the mean of the cycles is used.")
+            estimates.append(self.relay_estimate(time[:i+1], y[:i+1], relay[:i+1],\
+                                                    switches[1:], amplitude, hysteresis))
+        self.Ku, self.Tu = estimates[-1]
+        print("Relay tuning: Ku = " + str(self.Ku) + ", Tu = " + str(self.Tu) + " seconds.")
+        return self.Ku, self.Tu
+
+
+
+    def relay_estimate(self, time, y, relay, switches, amplitude, hysteresis):
+        """
+        this function return (Ku, Tu) of the relay cycles between the first
+        and the last switch times, the amplitude of the limit cycle is the one
+        of the first harmonic of the readings and of the relay
+        """
+        Tu = (switches[-1] - switches[0])/(len(switches) - 1)
+        inside = (time >= switches[0]) & (time < switches[-1])
+        phase = np.exp(-2j*math.pi*time[inside]/Tu)
+        n = max(np.count_nonzero(inside), 1)
+        a = 2*np.abs(np.sum((y[inside] - np.mean(y[inside]))*phase))/n
+        d = 2*amplitude*np.abs(np.sum((relay[inside] - np.mean(relay[inside]))*phase))/n
+        Ku = d/math.sqrt(max(a**2 - hysteresis**2, 1e-12))
+        return float(Ku), float(Tu)
 
 
 
@@ -222,16 +543,25 @@ class PID_LED():
         factor : int or float
             interpolation factor
         kind : string
-            interpolation kind
+            interpolation kind, 'linear', 'slinear', 'quadratic' or 'cubic'
+            (see PID_resample)
         """
+        from PID_resample import resample
 
-        f_photoresistance = interpolate.interp1d(self.time, self.photoresistance, kind='cubic')
-        f_out = interpolate.interp1d(self.time, self.out, kind='cubic')
-        time_interp = np.linspace(0, self.duration, int(factor*len(self.time)))
-
-        self.photoresistance = f_photoresistance(time_interp).tolist()
-        self.out = f_out(time_interp).tolist()
-        self.time = time_interp.tolist()
+        #one spline for both series, cached for the same data: keyed by the
+        #version of the buffer while they are its columns (no digest of the
+        #arrays to compute)
+        key = None
+        buffer = self.buffer
+        if buffer is not None and len(self.time) == len(buffer)\
+                and all(np.may_share_memory(series, buffer[name]) for name, series in\
+                    (('time', self.time), ('photoresistance', self.photoresistance),\
+                        ('out', self.out))):
+            key = ('buffer', buffer.version)
+        time_interp = np.linspace(self.time[0], self.time[-1], int(factor*len(self.time)))
+        self.photoresistance, self.out = resample(self.time, np.stack((self.photoresistance,\
+                                                    self.out)), time_interp, kind=kind, key=key)
+        self.time = time_interp
 
 
 
@@ -245,19 +575,9 @@ class PID_LED():
             numbers of index for sliding average
         """
 
-        def sliding(data_raw, avg_size):
-            data = (avg_size-1)*[0]+ data_raw #zero padding
-            data_nr = []
-            for i in range(len(data)+1-avg_size):
-                avg = 0
-                for j in range(avg_size):
-                    avg = avg + data[i+j]
-                avg = avg/avg_size
-                data_nr.append(avg)
-            return data_nr
-
-        self.photoresistance = sliding(self.photoresistance, avg_size)
-        self.out = sliding(self.out, avg_size)
+        #both series are averaged in one call, with zero padding
+        self.photoresistance, self.out = sliding_avg(np.stack((self.photoresistance,\
+                                            self.out)), avg_size)
         #self.time = np.linspace(0, self.duration, len(self.out)).tolist()
 
 
@@ -273,6 +593,7 @@ class PID_LED():
         factor: int or float
             interpolation factor
         """
+        import matplotlib.pyplot as plt
 
         if data_set == 'photoresistance':
             plt.plot(self.time, self.photoresistance, label ='Photorésistance', **kwargs)
@@ -296,13 +617,14 @@ class PID_LED():
         factor: int or float
             interpolation factor
         """
+        import matplotlib.pyplot as plt
 
         if data_set == 'photoresistance':
             plt.scatter(self.time, self.photoresistance, **kwargs)
         elif data_set == 'out':
             plt.scatter(self.time, self.out, **kwargs)
 
-    def analysis(self, eps=0.025, min_time = 10):
+    def analysis(self, eps=0.025, min_time = 10, verbose = True):
         """
         This function execute the analysis for dy_max, t_r and t_s
 
@@ -313,79 +635,30 @@ class PID_LED():
 
         min_time : minimal time for consideration of steady state
 
-        """
-
+        verbose : bool
+            print the results
 
-        def checkConsecutive(array):
-            """
-            this function check if a given array as consecutive number
-            """
-            if len(array) < int(min_time/self.delta_t):
-                return False
-            else:
-                # return true if consecutive (derivate of y=x)
-                return (sum(np.diff(array))/(len(array) - 1) ==1)
-
-
-        def steady_state(index_array):
-            """
-            this function find the index for steady state
-            """
-            if len(index_array) == 0:
-                return None
-            else:
-                i = 0
-                _continue = True
-                while _continue:
-                    if checkConsecutive(index_array[i:]):
-                        _continue = False # steady_state is achieve
-                        return i
-                    elif i == len(index_array)-1:
-                        _continue = False
-                        return None # no steady state
-                    else:
-                        i+=1
-
-        """
-        main analysis
         """
 
-        self.eps = eps
-        time_samples = np.array(self.time)
-        data_samples = np.array(self.photoresistance)
-
-        #calculate Overshooting
-        dy_max = np.max(data_samples) - self.Ref
-
-        #calculate rise time
-        index_t_r = np.where(data_samples >= self.Ref)[0]
-        if len(index_t_r) ==0:
-            t_r = None
-        else:
-            t_r = time_samples[index_t_r[0]]
-
-        #calculate steady state time
-        index_t_s =  np.where((data_samples < self.Ref + eps) & \
-                                (data_samples > self.Ref - eps))[0]
 
-        if len(index_t_s) == 0 or t_r == None:
-            t_s = None
-        else:
-            idx = steady_state(index_t_s)
-            if idx is None:
-                t_s = None
-            else:
-                t_s = time_samples[index_t_s[idx]] - t_r
-                if t_s < 0:
-                    t_s = None
+        self.eps = eps
+        #single vectorized pass, nan when a value is not defined
+        dy_max, t_r, t_s = step_metrics(self.time, self.photoresistance, self.Ref,\
+                                        eps, int(min_time/self.delta_t))
+        dy_max = float(dy_max)
+        t_r = None if np.isnan(t_r) else float(t_r)
+        t_s = None if np.isnan(t_s) else float(t_s)
 
         self.dy_max = dy_max
         self.t_r = t_r
         self.t_s = t_s
+        if self.record is not None:
+            update_header(self.record, eps=eps, dy_max=dy_max, t_r=t_r, t_s=t_s)
 
-        print("Overshooting is: " + str(dy_max))
-        print("Rise time is : " + str(t_r) + " seconds.")
-        print("Stabilization time is : " + str(t_s) + " seconds.")
+        if verbose:
+            print("Overshooting is: " + str(dy_max))
+            print("Rise time is : " + str(t_r) + " seconds.")
+            print("Stabilization time is : " + str(t_s) + " seconds.")
 
 
 
@@ -398,9 +671,11 @@ class PID_LED():
         self.previous_error = 0
         self.sum_error = 0
         self.present_out = 0
-        self.photoresistance = list()
-        self.out = list()
-        self.time = list()
+        self.buffer = None
+        self.metrics = None
+        self.photoresistance = np.empty(0)
+        self.out = np.empty(0)
+        self.time = np.empty(0)
         self.photoresistance_raw = None
         self.out_raw = None
         self.time_raw = None
@@ -410,6 +685,9 @@ class PID_LED():
         self.t_r = None
         self.t_s = None
         self.eps = None
+        self.timing = None
+        self.loop_timer = None
+        self.record = None
 
 
 
@@ -436,6 +714,9 @@ class PID_LED():
             json filname in which to dump the dict
         """
 
+        def tolist(array):
+            return None if array is None else np.asarray(array).tolist()
+
         data = {'Ref':self.Ref}
         data['duration'] = self.duration
         data['delta_t'] = self.delta_t
@@ -446,16 +727,42 @@ class PID_LED():
         data['Kd'] = self.Kd
         data['background'] = self.background
         data['max'] = self.max
-        data['photoresistance'] = self.photoresistance
-        data['out'] = self.out
-        data['time'] = self.time
-        data['photoresistance_raw'] = self.photoresistance_raw
-        data['out_raw'] = self.out_raw
-        data['time_raw'] = self.time_raw
+        data['photoresistance'] = tolist(self.photoresistance)
+        data['out'] = tolist(self.out)
+        data['time'] = tolist(self.time)
+        data['photoresistance_raw'] = tolist(self.photoresistance_raw)
+        data['out_raw'] = tolist(self.out_raw)
+        data['time_raw'] = tolist(self.time_raw)
         data['dy_max'] = self.dy_max
         data['t_r'] = self.t_r
         data['t_s']= self.t_s
         data['eps']= self.eps
+        data['timing'] = self.timing
 
         with open(filename + ".json", 'w') as file:
                 json.dump(data, file)
+
+
+
+    def load(self, filename):
+        """
+        This function load a run file written by apply(record=filename), the
+        samples are mapped from the file without parsing (also works on a
+        file still being written)
+
+        Parameters
+        filename : str
+            run filname without extension
+        """
+        header, records = load_run(filename + EXTENSION)
+        for key in ('Ref', 'duration', 'delta_t', 'Ku', 'Tu', 'Kp', 'Ki', 'Kd',\
+                        'background', 'max', 'eps', 'dy_max', 't_r', 't_s'):
+            if key in header:
+                setattr(self, key, header[key])
+        self.record = filename + EXTENSION
+        self.photoresistance_raw = records['photoresistance']
+        self.out_raw = records['out']
+        self.time_raw = records['time']
+        self.photoresistance = self.photoresistance_raw
+        self.out = self.out_raw
+        self.time = self.time_raw
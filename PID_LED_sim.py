@@ -0,0 +1,185 @@
+"""
+Simulated LED/photoresistor plant for the PID_LED controller
+Polytechnique Montreal
+"""
+
+import math
+from collections import deque
+import numpy as np
+
+
+
+class Virtual_clock():
+    def __init__(self, start=0.):
+        """
+        Parameters
+        ----------------------
+        start : float
+            initial time in seconds
+        """
+        self.t = start
+
+    def time(self):
+        """
+        this function return the virtual time in seconds
+        """
+        return self.t
+
+    def monotonic_ns(self):
+        """
+        this function return the virtual time in nanoseconds
+        """
+        return int(round(self.t*1e9))
+
+    def sleep(self, delay):
+        """
+        this function advance the virtual time instead of waiting
+        """
+        if delay > 0:
+            self.t += delay
+
+
+
+class LED_plant():
+    def __init__(self, gain=0.7, tau=0.5, delay=0.2, background=0.1, noise=0.005,
+                    bits=10, seed=None, clock=None):
+        """
+        First order plus dead time model of the LED seen by the photoresistance.
+        The noise free sensor value follows
+            tau*dy/dt = background + gain*u(t - delay) - y
+
+        Parameters
+        ----------------------
+        gain : float
+            sensor value increase between the LED off and fully on
+        tau : float
+            time constant of the photoresistance in seconds
+        delay : float
+            dead time between the LED command and the sensor in seconds
+        background : float
+            sensor value with the LED off
+        noise : float
+            standard deviation of the gaussian noise added to each reading
+        bits : int
+            resolution of the ADC (10 for the MCP3008)
+        seed : int
+            seed of the noise generator
+        clock : Virtual_clock
+            clock shared with the controller, a new one is created if None
+        """
+        self.gain = gain
+        self.tau = tau
+        self.delay = delay
+        self.background = background
+        self.noise = noise
+        self.levels = 2**bits - 1
+        self.clock = Virtual_clock() if clock is None else clock
+        self.rng = np.random.default_rng(seed)
+
+        #plant state
+        self.command = 0.
+        self.command_delayed = 0.
+        self.pending = deque() #(time of effect, command)
+        self.y = background
+        self.t = self.clock.time()
+
+        #gpiozero like devices
+        self.led = Sim_LED(self)
+        self.sensor = Sim_sensor(self)
+
+
+
+    def integrate(self, t):
+        """
+        this function propagate the exact solution for a constant input up to t
+        """
+        dt = t - self.t
+        if dt <= 0:
+            return
+        y_ss = self.background + self.gain*self.command_delayed
+        if self.tau > 0:
+            self.y = y_ss + (self.y - y_ss)*math.exp(-dt/self.tau)
+        else:
+            self.y = y_ss
+        self.t = t
+
+
+
+    def advance(self):
+        """
+        this function bring the plant to the present time of the clock
+        """
+        t = self.clock.time()
+        while self.pending and self.pending[0][0] <= t:
+            t_effect, command = self.pending.popleft()
+            self.integrate(t_effect)
+            self.command_delayed = command
+        self.integrate(t)
+
+
+
+    def write(self, value):
+        """
+        this function set the LED command, seen by the sensor after the delay
+        """
+        self.advance()
+        self.command = value
+        if self.delay > 0:
+            self.pending.append((self.t + self.delay, value))
+        else:
+            self.command_delayed = value
+
+
+
+    def read(self):
+        """
+        this function return a noisy and quantized sensor value between 0 and 1
+        """
+        self.advance()
+        y = self.y
+        if self.noise > 0:
+            y += self.noise*self.rng.standard_normal()
+        y = max(min(1, y), 0)
+        return round(y*self.levels)/self.levels
+
+
+
+class Sim_LED():
+    def __init__(self, plant, pin=16):
+        """
+        Parameters
+        ----------------------
+        plant : LED_plant
+            plant driven by the LED
+        pin : int
+            label of the simulated GPIO pin
+        """
+        self.plant = plant
+        self.pin = pin
+
+    @property
+    def value(self):
+        return self.plant.command
+
+    @value.setter
+    def value(self, value):
+        self.plant.write(value)
+
+
+
+class Sim_sensor():
+    def __init__(self, plant, channel=0):
+        """
+        Parameters
+        ----------------------
+        plant : LED_plant
+            plant read by the sensor
+        channel : int
+            label of the simulated ADC channel
+        """
+        self.plant = plant
+        self.channel = channel
+
+    @property
+    def value(self):
+        return self.plant.read()
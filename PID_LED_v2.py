@@ -6,10 +6,9 @@ Polytechnique Montreal
 
 from time import sleep
 import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib.animation as animation
-from scipy import interpolate
 import json
+#matplotlib and scipy are imported by the methods which use them
+from PID_filter import Moving_average, sliding_avg
 
 
 
@@ -103,13 +102,6 @@ class PID_LED():
             """
             this code execute the PID control for iteration i
             """
-            def sliding(raw, avg_size):
-                avg =0
-                for j in range(avg_size):
-                    avg += raw[i+j]
-                    return avg
-
-
             self.time.append(i*self.delta_t)
             photoresistance = 0
             for j in range(bin_size):
@@ -120,8 +112,7 @@ class PID_LED():
 
             #photoresistance = self.sensor.value - self.background
 
-            raw.append(photoresistance)
-            present_value = sliding(raw, avg_size)
+            present_value = raw.update(photoresistance)
             self.photoresistance.append(present_value)
             present_error = self.Ref - present_value
             self.sum_error += present_error
@@ -157,7 +148,8 @@ class PID_LED():
 
 
         if live:
-            raw = (avg_size-1)*[self.background] #  padding
+            import matplotlib.pyplot as plt
+            raw = Moving_average(avg_size, self.background) #  padding
             plt.axis([0, self.duration, 0, 1])
             plt.plot([0, self.duration], [self.Ref, self.Ref], 'k--')
             plt.legend(['Target value'])
@@ -175,7 +167,7 @@ class PID_LED():
             plt.clf() #clear graph after
 
         else:
-            raw = (avg_size-1)*[self.background] #  padding
+            raw = Moving_average(avg_size, self.background) #  padding
             for i in range(int(duration/delta_t)+1):
                 execute_PID(raw, i)
 
@@ -199,6 +191,7 @@ class PID_LED():
         kind : string
             interpolation kind
         """
+        from scipy import interpolate
 
         f_photoresistance = interpolate.interp1d(self.time, self.photoresistance, kind='cubic')
         f_out = interpolate.interp1d(self.time, self.out, kind='cubic')
@@ -220,19 +213,8 @@ class PID_LED():
             numbers of index for sliding average
         """
 
-        def sliding(data_raw, avg_size):
-            data = (avg_size-1)*[0]+ data_raw #zero padding
-            data_nr = []
-            for i in range(len(data)+1-avg_size):
-                avg = 0
-                for j in range(avg_size):
-                    avg = avg + data[i+j]
-                avg = avg/avg_size
-                data_nr.append(avg)
-            return data_nr
-
-        self.photoresistance = sliding(self.photoresistance, avg_size)
-        self.out = sliding(self.out, avg_size)
+        self.photoresistance = sliding_avg(self.photoresistance, avg_size).tolist()
+        self.out = sliding_avg(self.out, avg_size).tolist()
         #self.time = np.linspace(0, self.duration, len(self.out)).tolist()
 
 
@@ -248,6 +230,7 @@ class PID_LED():
         factor: int or float
             interpolation factor
         """
+        import matplotlib.pyplot as plt
 
         if data_set == 'photoresistance':
             plt.plot(self.time, self.photoresistance, **kwargs)
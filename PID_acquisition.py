@@ -0,0 +1,147 @@
+"""
+Background acquisition of the sensor at a high fixed rate, with a decimating
+filter, so the controller read the latest filtered value without waiting
+Polytechnique Montreal
+"""
+
+import threading
+import time
+import numpy as np
+from PID_scheduler import Rate_scheduler
+from PID_filter import Moving_average
+
+
+
+class Acquisition():
+    def __init__(self, sensor, rate=500, decimation=50, stages=1, capacity=4096, clock=None):
+        """
+        A producer thread read the sensor at rate Hz into a ring buffer and
+        filter the samples with a CIC filter: stages cascaded moving averages
+        of decimation samples, one output every decimation samples (stages=1
+        is the boxcar average of each block).
+
+        The raw and filtered rings have a single writer and a write counter,
+        the readers never block the producer.
+
+        It replace the sensor of PID_LED, with bin_size=1 the controller take
+        the last filtered value instead of averaging bin_size readings.
+
+        Parameters
+        ----------------------
+        sensor : MCP3008 (gpiozero like)
+            sensor read by the thread
+        rate : float
+            sampling rate in Hz
+        decimation : int
+            number of samples of each filtered value
+        stages : int
+            order of the CIC filter
+        capacity : int
+            length of the raw and filtered rings
+        clock : object with monotonic_ns() and sleep() methods
+            time module if None, it must be a real clock (not a Virtual_clock)
+        """
+        self.sensor = sensor
+        self.channel = getattr(sensor, 'channel', None) #for Calibration_cache
+        self.rate = rate
+        self.decimation = decimation
+        self.stages = stages
+        self.clock = clock
+
+        self.raw = np.zeros(capacity)
+        self.raw_count = 0
+        self.filtered = np.zeros(capacity)
+        self.filtered_count = 0
+        self.scheduler = None
+        self.running = False
+        self.thread = None
+
+
+
+    def run(self):
+        """
+        this function is the producer loop of the thread
+        """
+        filters = [Moving_average(self.decimation) for k in range(self.stages)]
+        capacity = len(self.raw)
+        #the thread run for hours: the jitter of the last ticks only
+        self.scheduler = Rate_scheduler(1/self.rate, self.clock, 1024, ring=True)
+        self.scheduler.start()
+        n = 0
+        while self.running:
+            self.scheduler.wait()
+            value = self.sensor.value
+            self.raw[self.raw_count % capacity] = value
+            self.raw_count += 1
+            for stage in filters:
+                value = stage.update(value)
+            n += 1
+            #an output once the filter is full, then every decimation samples
+            if n >= self.stages*self.decimation and n % self.decimation == 0:
+                self.filtered[self.filtered_count % capacity] = value
+                self.filtered_count += 1
+
+
+
+    def start(self):
+        """
+        this function start the producer thread
+        """
+        if self.thread is not None:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+
+
+    def stop(self, timeout=1):
+        """
+        this function stop the producer thread
+        """
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(timeout)
+            self.thread = None
+
+
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+
+    def latest(self, n=1, filtered=False):
+        """
+        this function return a copy of the last n raw (or filtered) samples,
+        oldest first
+        """
+        ring, count = (self.filtered, self.filtered_count) if filtered else (self.raw, self.raw_count)
+        n = min(n, count, len(ring))
+        index = np.arange(count - n, count) % len(ring)
+        return ring[index]
+
+
+
+    @property
+    def value(self):
+        """
+        last filtered value, the mean of the raw samples before the first one
+        (the thread is started by the first read)
+        """
+        self.start()
+        count = self.filtered_count
+        if count > 0:
+            return float(self.filtered[(count - 1) % len(self.filtered)])
+        while self.raw_count == 0 and self.running:
+            (time if self.clock is None else self.clock).sleep(1/self.rate)
+        return float(self.latest(self.decimation).mean())
+
+
+
+    def close(self):
+        self.stop()
@@ -0,0 +1,132 @@
+"""
+Vectorized closed-loop simulation of many PID_LED configurations at once
+Polytechnique Montreal
+"""
+
+import math
+import numpy as np
+
+
+
+def gain_grid(Kp_list, Ki_list=(0,), Kd_list=(0,), Ref_list=(0.5,)):
+    """
+    this function return the flattened cartesian product of the gain lists
+
+    Parameters
+    ----------------------
+    Kp_list, Ki_list, Kd_list, Ref_list : sequence of float
+        values to combine
+
+    Returns
+    ----------------------
+    Kp, Ki, Kd, Ref : ndarray
+        1D arrays of length len(Kp_list)*len(Ki_list)*len(Kd_list)*len(Ref_list)
+    """
+    grids = np.meshgrid(Kp_list, Ki_list, Kd_list, Ref_list, indexing='ij')
+    return tuple(grid.ravel() for grid in grids)
+
+
+
+def simulate_batch(Kp, Ki=0, Kd=0, Ref=0.5, duration=120, delta_t=1, bin_size=5,
+                    gain=0.7, tau=0.5, delay=0.2, background=0.1, noise=0.005,
+                    bits=10, seed=None):
+    """
+    This function advance N closed loops together on the LED_plant model of
+    PID_LED_sim, with the same readings schedule, PID update and 0..1 clamp
+    as PID_LED.apply.
+    The calibration is taken as ideal: background and background + gain.
+
+    Parameters
+    ----------------------
+    Kp, Ki, Kd, Ref : float or array_like
+        controller gains and target values, broadcast together to N runs
+    duration: float
+        recording duration
+    delta_t : float
+        time between recordings
+    bin_size : int
+        number of samples to average for each delta_t
+    gain, tau, delay, background, noise, bits :
+        plant parameters, see PID_LED_sim.LED_plant
+    seed : int
+        seed of the noise generator
+
+    Returns
+    ----------------------
+    time : ndarray (samples,)
+        time of each recording
+    photoresistance : ndarray (N, samples)
+        normalized sensor values
+    out : ndarray (N, samples)
+        LED command after each recording
+    """
+    Kp, Ki, Kd, Ref = np.broadcast_arrays(*(np.atleast_1d(np.asarray(x, dtype=float))\
+                                            for x in (Kp, Ki, Kd, Ref)))
+    N = Kp.shape[0]
+    n_samples = int(duration/delta_t)+1
+    rng = np.random.default_rng(seed)
+    levels = 2**bits - 1
+    y_max = min(background + gain, 1)
+
+    #exact discretization of the first order plant on each sub step h, the
+    #delayed command switches r seconds after the beginning of a sub step
+    h = delta_t/bin_size
+    m = int(delay//h)
+    r = delay - m*h
+    a1 = math.exp(-r/tau) if tau > 0 else 0.
+    a2 = math.exp(-(h - r)/tau) if tau > 0 else 0.
+    L = m + 2
+    history = np.zeros((L, N)) #command applied during the last L sub steps
+
+    y = np.full(N, float(background))
+    sum_error = np.zeros(N)
+    previous_error = np.zeros(N)
+    present_out = np.zeros(N)
+    photoresistance = np.empty((N, n_samples))
+    out = np.empty((N, n_samples))
+    acc = np.empty(N)
+    reading = np.empty(N)
+
+    s = 0
+    for i in range(n_samples):
+        acc[:] = 0
+        for j in range(bin_size):
+            #sensor reading
+            if noise > 0:
+                np.multiply(rng.standard_normal(N), noise, out=reading)
+                reading += y
+            else:
+                reading[:] = y
+            np.clip(reading, 0, 1, out=reading)
+            reading *= levels
+            np.round(reading, out=reading)
+            acc += reading
+
+            if j == bin_size - 1:
+                #the LED is updated right after the last reading
+                value = (acc/(levels*bin_size) - background)/(y_max - background)
+                photoresistance[:, i] = value
+                present_error = Ref - value
+                sum_error += present_error
+
+                # PID control algorithm
+                P = Kp*present_error
+                I = Ki*sum_error*delta_t
+                D = Kd*(present_error - previous_error)/delta_t
+
+                #increment and limit the output value of the LED
+                present_out += P+I+D
+                np.clip(present_out, 0, 1, out=present_out)
+                out[:, i] = present_out
+                previous_error = present_error
+
+            #plant over the sub step
+            history[s % L] = present_out
+            y_ss = background + gain*history[(s - m - 1) % L]
+            y = y_ss + (y - y_ss)*a1
+            y_ss = background + gain*history[(s - m) % L]
+            y = y_ss + (y - y_ss)*a2
+            s += 1
+
+    time = np.arange(n_samples)*delta_t
+    return time, photoresistance, out
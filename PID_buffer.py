@@ -0,0 +1,97 @@
+"""
+Preallocated columnar storage for the samples of a run
+Polytechnique Montreal
+"""
+
+import itertools
+import numpy as np
+
+#versions of the buffers, unique among all of them (cache keys)
+VERSIONS = itertools.count(1)
+
+
+class Run_buffer():
+    def __init__(self, columns, capacity=1024):
+        """
+        Each column is a preallocated array, appending a row only write in the
+        arrays and the capacity is doubled when full (amortized growth).
+
+        Parameters
+        ----------------------
+        columns : dict
+            name and dtype of each column, in the order of append(), or
+            name and (dtype, shape) for a column of arrays (one per row)
+        capacity : int
+            number of rows allocated at creation
+        """
+        self.names = tuple(columns)
+        self.columns = []
+        for spec in columns.values():
+            dtype, shape = spec if isinstance(spec, tuple) else (spec, ())
+            shape = (shape,) if np.isscalar(shape) else tuple(shape)
+            self.columns.append(np.empty((max(1, capacity),) + shape, dtype=dtype))
+        self.n = 0
+        self.version = next(VERSIONS) #new value when the content change
+
+
+
+    def __len__(self):
+        return self.n
+
+
+
+    def __getitem__(self, name):
+        """
+        this function return a view (no copy) of the filled part of a column
+        """
+        return self.columns[self.names.index(name)][:self.n]
+
+
+
+    def last(self, name):
+        """
+        this function return the value of a column at the last row
+        """
+        return self.columns[self.names.index(name)][self.n - 1]
+
+
+
+    @property
+    def capacity(self):
+        return len(self.columns[0])
+
+
+
+    def grow(self, capacity=None):
+        """
+        this function reallocate the columns, doubling the capacity by default
+        (views taken before are not updated)
+        """
+        capacity = capacity or 2*self.capacity
+        for k, column in enumerate(self.columns):
+            new = np.empty((capacity,) + column.shape[1:], dtype=column.dtype)
+            new[:self.n] = column[:self.n]
+            self.columns[k] = new
+
+
+
+    def append(self, *values):
+        """
+        this function write one row, values are in the order of the columns
+        """
+        if self.n == self.capacity:
+            self.grow()
+        n = self.n
+        for column, value in zip(self.columns, values):
+            column[n] = value
+        self.n = n + 1
+        self.version = next(VERSIONS)
+
+
+
+    def clear(self):
+        """
+        this function empty the buffer without releasing the memory
+        """
+        self.n = 0
+        self.version = next(VERSIONS)
@@ -0,0 +1,138 @@
+"""
+Cache of the background/maximum calibration of each LED and sensor pair
+Polytechnique Montreal
+"""
+
+import json
+import os
+import time
+
+
+
+class Calibration_cache():
+    def __init__(self, validity=600, tolerance=0.03, burst=5, settle=0.5,\
+                    clock=None, filename=None):
+        """
+        A cached calibration is reused while it is younger than validity and
+        a quick burst of readings with the LED on still match the last
+        readings with the LED on of the calibration, otherwise the full
+        calibration is done again.
+
+        Parameters
+        ----------------------
+        validity : float
+            maximal age of a calibration in seconds
+        tolerance : float
+            accepted drift of the burst, as a fraction of max - background
+        burst : int
+            number of readings averaged by the drift check
+        settle : float
+            waiting time after switching the LED and between the bursts in
+            seconds, as calibrate()
+        clock : object with a time() method
+            time module if None (or a Virtual_clock)
+        filename : str
+            json file to keep the calibrations between sessions
+        """
+        self.validity = validity
+        self.tolerance = tolerance
+        self.burst = burst
+        self.settle = settle
+        self.clock = time if clock is None else clock
+        self.filename = filename
+        self.entries = {}
+        if filename is not None and os.path.exists(filename):
+            with open(filename) as file:
+                self.entries = json.load(file)
+
+
+
+    def key(self, led, sensor):
+        """
+        this function return the key of a LED (pin) and sensor (channel) pair
+        """
+        pin = getattr(led, 'pin', None)
+        channel = getattr(sensor, 'channel', None)
+        return str(id(led) if pin is None else pin) + '|' \
+                + str(id(sensor) if channel is None else channel)
+
+
+
+    def read_burst(self, led, sensor, wait, stable):
+        """
+        This function return the mean of a burst of readings with the LED on
+        (the ambient light also change this value), from the LED off. A new
+        burst is read every settle seconds until two of them differ by less
+        than stable (the sensor still lag after the previous run), at most
+        for 5s as in calibrate().
+        """
+        if led.value != 0:
+            led.value = 0
+            wait(self.settle)
+        led.value = 1
+        value = None
+        for i in range(max(2, int(round(5/self.settle)))):
+            wait(self.settle)
+            previous, value = value, sum(sensor.value for j in range(self.burst))/self.burst
+            if previous is not None and abs(value - previous) < stable:
+                break
+        led.value = 0
+        wait(self.settle)
+        return value
+
+
+
+    def drifted(self, entry, led, sensor, wait):
+        """
+        this function compare a new burst to the settled readings with the LED
+        on of the calibration
+        """
+        tolerance = self.tolerance*(entry['max'] - entry['background'])
+        value = self.read_burst(led, sensor, wait, tolerance/2)
+        return abs(value - entry['check']) > tolerance
+
+
+
+    def get(self, led, sensor, calibrate, wait):
+        """
+        This function return the (background, max) of the pair, from the cache
+        when still valid (always for a known calibration) or from a new
+        calibration
+
+        Parameters
+        ----------------------
+        led, sensor : gpiozero like objects
+            pair to calibrate
+        calibrate : callable
+            full calibration, return (background, max, readings with the LED
+            on), the settled second half of the readings is the reference of
+            the drift check
+        wait : callable
+            sleep function of the controller
+        """
+        key = self.key(led, sensor)
+        entry = self.entries.get(key)
+        if entry is not None and entry.get('check') is None:
+            return entry['background'], entry['max']
+        if entry is not None and self.clock.time() - entry['time'] < self.validity\
+                and not self.drifted(entry, led, sensor, wait):
+            return entry['background'], entry['max']
+
+        background, max, readings = calibrate()
+        settled = readings[len(readings)//2:]
+        self.set(led, sensor, background, max, sum(settled)/len(settled))
+        return background, max
+
+
+
+    def set(self, led, sensor, background, max, check=None):
+        """
+        this function store the calibration of the pair made now, check is the
+        reference of the drift check (None: no check, for a known calibration
+        such as the one of a recorded run)
+        """
+        self.entries[self.key(led, sensor)] = {'background': background, 'max': max,\
+                                                'time': self.clock.time(), 'check': check}
+        if self.filename is not None:
+            with open(self.filename, 'w') as file:
+                json.dump(self.entries, file)
@@ -0,0 +1,233 @@
+"""
+Device backends of the scripts: the gpiozero devices of the Raspberry Pi or
+in process fakes driven by the simulated plant or by a recorded run
+Polytechnique Montreal
+"""
+
+import os
+import time
+import json
+import numpy as np
+import PID_spi
+from PID_calibration import Calibration_cache
+from PID_LED_sim import Virtual_clock, LED_plant, Sim_LED, Sim_sensor
+
+BACKEND_VARIABLE = 'PID_LED_BACKEND' #gpio (default), sim or trace
+TRACE_VARIABLE = 'PID_LED_TRACE' #run file (.pidrun or .json) of the trace backend
+
+
+
+class Fake_PWMLED(Sim_LED):
+    def __init__(self, plant, pin=16, initial_value=0):
+        """
+        PWMLED like LED of a simulated plant (a plant without its LED, when
+        the sensor replay a trace, simply ignore the commands)
+        """
+        Sim_LED.__init__(self, plant, pin)
+        self.value = initial_value
+
+    def on(self):
+        self.value = 1
+
+    def off(self):
+        self.value = 0
+
+    def close(self):
+        self.value = 0
+
+
+
+class Fake_MCP3008(Sim_sensor):
+    def __init__(self, plant, channel=0):
+        """
+        MCP3008 (or LightSensor) like sensor of a simulated plant
+        """
+        Sim_sensor.__init__(self, plant, channel)
+
+    def close(self):
+        pass
+
+
+
+class Trace_plant():
+    def __init__(self, time, values, clock):
+        """
+        Plant replaying the sensor values of a recorded run (linear
+        interpolation at the time of the clock), the LED commands are only
+        kept. The replay start at the first reading, the calibration is
+        taken from the recording (see Fake_board.Calibration_cache).
+
+        Parameters
+        ----------------------
+        time : array_like
+            time of the recorded values, from the start of the run
+        values : array_like
+            recorded sensor values between 0 and 1
+        clock : Virtual_clock
+            clock of the controller
+        """
+        self.time = np.asarray(time, dtype=float)
+        self.values = np.asarray(values, dtype=float)
+        self.clock = clock
+        self.start = None
+        self.command = 0.
+
+    def write(self, value):
+        self.command = value
+
+    def read(self):
+        if self.start is None:
+            self.start = self.clock.time()
+        return float(np.interp(self.clock.time() - self.start, self.time, self.values))
+
+
+
+def load_trace(filename):
+    """
+    this function return the (time, sensor values) of a recorded run and its
+    (background, max) calibration, the normalized readings are converted back
+    with it
+    """
+    if filename.endswith('.pidrun'):
+        from PID_runfile import load_run
+        header, records = load_run(filename)
+        time, photoresistance = records['time'], records['photoresistance']
+    else:
+        with open(filename) as file:
+            header = json.load(file)
+        time, photoresistance = header['time_raw'], header['photoresistance_raw']
+    background, max = header['background'], header['max']
+    time = np.asarray(time, dtype=float)
+    values = background + np.asarray(photoresistance, dtype=float)*(max - background)
+    return time - time[0], values, (background, max)
+
+
+
+class Gpio_board():
+    def __init__(self):
+        """
+        gpiozero devices of the Raspberry Pi, with the real time
+        """
+        import gpiozero
+        self.PWMLED = gpiozero.PWMLED
+        self.MCP3008 = gpiozero.MCP3008
+        self.LightSensor = gpiozero.LightSensor
+        self.clock = None #time module
+
+    def Calibration_cache(self, **options):
+        return Calibration_cache(**options)
+
+    def MCP3008_burst(self, channel=0, oversample=16, **spi_args):
+        return PID_spi.MCP3008_burst(channel, oversample, **spi_args)
+
+    def sleep(self, delay):
+        time.sleep(delay)
+
+
+
+class Fake_board():
+    def __init__(self, clock=None, trace=None, seed=None, **plant):
+        """
+        Fake devices with the gpiozero signatures, all on one virtual clock.
+        The n-th LED created light the n-th sensor created, each pair is an
+        LED_plant or, with a trace, replay the recorded sensor values.
+
+        Parameters
+        ----------------------
+        clock : Virtual_clock
+            clock shared by the devices, a new one is created if None
+        trace : str or (time, values)
+            recorded run replayed by the sensors, see load_trace, its
+            calibration is given by Calibration_cache()
+        seed : int
+            seed of the first plant (seed+1 for the second, ...)
+        plant :
+            parameters of LED_plant
+        """
+        self.clock = Virtual_clock() if clock is None else clock
+        self.calibration = None #(background, max) of the recorded run
+        if isinstance(trace, str):
+            *trace, self.calibration = load_trace(trace)
+        self.trace = trace
+        self.seed = seed
+        self.plant = plant
+        self.plants = []
+        self.leds = []
+        self.sensors = []
+
+    def cell(self, index):
+        """
+        this function return the plant of a LED/sensor pair
+        """
+        while len(self.plants) <= index:
+            if self.trace is not None:
+                self.plants.append(Trace_plant(*self.trace, clock=self.clock))
+            else:
+                seed = None if self.seed is None else self.seed + len(self.plants)
+                self.plants.append(LED_plant(seed=seed, clock=self.clock, **self.plant))
+        return self.plants[index]
+
+    def Calibration_cache(self, **options):
+        """
+        this function return a calibration cache on the clock of the board,
+        with a trace the pairs already created are calibrated as the recorded
+        run (the replayed values do not depend on the LED)
+        """
+        cache = Calibration_cache(clock=self.clock, **options)
+        if self.calibration is not None:
+            for led, sensor in zip(self.leds, self.sensors):
+                cache.set(led, sensor, *self.calibration)
+        return cache
+
+    def PWMLED(self, pin, active_high=True, initial_value=0, frequency=100, pin_factory=None):
+        self.leds.append(Fake_PWMLED(self.cell(len(self.leds)), pin, initial_value))
+        return self.leds[-1]
+
+    def MCP3008(self, channel=0, differential=False, max_voltage=3.3, **spi_args):
+        self.sensors.append(Fake_MCP3008(self.cell(len(self.sensors)), channel))
+        return self.sensors[-1]
+
+    def MCP3008_burst(self, channel=0, oversample=16, **spi_args):
+        plant = self.cell(len(self.sensors))
+        transport = PID_spi.Loopback_transport(lambda channel: plant.read())
+        self.sensors.append(PID_spi.MCP3008_burst(channel, oversample, transport))
+        return self.sensors[-1]
+
+    def LightSensor(self, pin, queue_len=5, charge_time_limit=0.01, threshold=0.1,\
+                        partial=False, pin_factory=None):
+        self.sensors.append(Fake_MCP3008(self.cell(len(self.sensors)), pin))
+        return self.sensors[-1]
+
+    def sleep(self, delay):
+        self.clock.sleep(delay)
+
+
+
+def get_board(backend=None, **options):
+    """
+    This function return the device backend, with PWMLED, MCP3008,
+    MCP3008_burst (hardware SPI, see PID_spi), LightSensor and
+    Calibration_cache constructors, sleep() and the clock to give to PID_LED
+
+    Parameters
+    ----------------------
+    backend : str
+        'gpio', 'sim' or 'trace', read from the PID_LED_BACKEND environment
+        variable if None ('gpio' by default)
+    options :
+        parameters of Fake_board, the trace file is read from PID_LED_TRACE
+        if not given
+    """
+    if backend is None:
+        backend = os.environ.get(BACKEND_VARIABLE, 'gpio')
+    if backend == 'gpio':
+        return Gpio_board()
+    elif backend == 'sim':
+        return Fake_board(**options)
+    elif backend == 'trace':
+        options.setdefault('trace', os.environ.get(TRACE_VARIABLE))
+        if options['trace'] is None:
+            raise ValueError("the trace backend need a run file (" + TRACE_VARIABLE + ")")
+        return Fake_board(**options)
+    else:
+        raise ValueError("unknown device backend " + str(backend))
@@ -0,0 +1,76 @@
+"""
+Moving average filter, online (one sample at a time) or on whole arrays
+Polytechnique Montreal
+"""
+
+import numpy as np
+
+
+
+class Moving_average():
+    def __init__(self, avg_size=3, initial=0.):
+        """
+        Online sliding average: a ring buffer and a running sum, so each new
+        sample cost O(1) whatever avg_size.
+
+        Parameters
+        ----------------------
+        avg_size : int
+            numbers of samples for sliding average
+        initial : float
+            padding value of the window before the first samples
+        """
+        self.avg_size = avg_size
+        self.window = np.full(avg_size, float(initial))
+        self.sum = float(initial)*avg_size
+        self.index = 0
+
+    def update(self, value):
+        """
+        this function add one sample and return the present average
+        """
+        self.sum += value - self.window[self.index]
+        self.window[self.index] = value
+        self.index = (self.index + 1) % self.avg_size
+        return self.sum/self.avg_size
+
+
+
+def sliding_avg(data, avg_size=3, padding=True):
+    """
+    This function compute the sliding average along the last axis, so a 2D
+    array average each run (row) at once.
+
+    Parameters
+    ----------------------
+    data : array_like
+        1D samples or 2D (runs x samples)
+    avg_size : int
+        numbers of samples for sliding average
+    padding : bool
+        zero padding at the start, the result keep the length of data,
+        otherwise the result has avg_size-1 fewer samples
+
+    Returns
+    ----------------------
+    data_nr : ndarray
+        averaged data
+    """
+    data = np.asarray(data, dtype=float)
+    if padding:
+        pad = np.zeros(data.shape[:-1] + (avg_size-1,))
+        data = np.concatenate((pad, data), axis=-1)
+    n = data.shape[-1]+1-avg_size
+    if n <= 0:
+        return np.empty(data.shape[:-1] + (0,))
+
+    if avg_size <= 32:
+        #sum of shifted views, same additions in the same order as a loop
+        data_nr = np.zeros(data.shape[:-1] + (n,))
+        for j in range(avg_size):
+            data_nr += data[..., j:j+n]
+    else:
+        cumsum = np.cumsum(data, axis=-1)
+        data_nr = cumsum[..., avg_size-1:].copy()
+        data_nr[..., 1:] -= cumsum[..., :n-1]
+    return data_nr/avg_size
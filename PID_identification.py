@@ -0,0 +1,222 @@
+"""
+First order plus dead time (FOPDT) identification from recorded runs and
+tuning rules computed from the fitted model
+Polytechnique Montreal
+"""
+
+import json
+import numpy as np
+
+
+
+def load_json_run(filename):
+    """
+    this function return (time, out, photoresistance) of a PID_LED.save() file
+    """
+    with open(filename) as file:
+        data = json.load(file)
+    return np.asarray(data['time_raw']), np.asarray(data['out_raw']),\
+            np.asarray(data['photoresistance_raw'])
+
+
+
+def load_npz_runs(raw_file, param_file):
+    """
+    This function load the runs of TP3_px_vf.py. The LED output was not saved,
+    it is computed again from the recorded values with the same PID law.
+
+    Parameters
+    ----------------------
+    raw_file : str
+        npz file with LEDs_vect and time_raw (PID_*_raw_data.npz)
+    param_file : str
+        json file with the parameters (PID_*_param.json)
+
+    Returns
+    ----------------------
+    time : ndarray (samples,)
+    out, photoresistance : ndarray (runs, samples)
+    """
+    raw = np.load(raw_file)
+    LEDs_vect, time = raw['arr_0'], raw['arr_1']
+    with open(param_file) as file:
+        param = json.load(file)
+    runs = len(LEDs_vect)
+    gains = {key: np.full(runs, float(param[key])) for key in ('Kp', 'Ki', 'Kd', 'Ref')}
+    for key in ('Kp', 'Ki', 'Kd', 'Ref'):
+        if key + '_list' in param:
+            gains[key] = np.asarray(param[key + '_list'], dtype=float)
+    sleep_time = param['sleep_time']
+
+    #same law as PID_LED() of TP3_px_vf.py, for all the runs at once
+    photoresistance = np.asarray(LEDs_vect, dtype=float)
+    out = np.empty_like(photoresistance)
+    error0 = np.zeros(runs)
+    present_out = np.zeros(runs)
+    for i in range(photoresistance.shape[1]):
+        error = gains['Ref'] - photoresistance[:, i]
+        P = gains['Kp']*error
+        I = gains['Ki']*(error0 + error)*sleep_time
+        D = gains['Kd']*(error - error0)/sleep_time
+        present_out = np.clip(present_out + P+I+D, 0, 1)
+        out[:, i] = present_out
+        error0 = error
+    return time, out, photoresistance
+
+
+
+def pad(series):
+    """
+    this function stack 1D series of different lengths in a 2D array padded
+    with nan
+    """
+    series = [np.asarray(s, dtype=float) for s in series]
+    array = np.full((len(series), max(len(s) for s in series)), np.nan)
+    for k, s in enumerate(series):
+        array[k, :len(s)] = s
+    return array
+
+
+
+def fit_fopdt(out, photoresistance, delta_t, max_delay=10):
+    """
+    This function fit K, tau and theta of
+        tau*dy/dt = K*u(t - theta) + y0 - y
+    to many runs at once (y0 is the background, zero for normalized readings
+    but not for the raw readings of TP3_px_vf.py). For each delay d (in
+    samples) the discrete model
+        y[k+1] = a*y[k] + b*u[k-d] + c
+    is solved by least squares for all the runs with batched normal equations.
+    The shortest delay whose residual is within 1% of the best one is kept,
+    among the stable models (0 < a < 1, the other delays only fit the noise).
+    A closed loop run is informative only during its transients: when y stay
+    proportional to u the fit is ill-conditioned (check rms and tau).
+
+    Parameters
+    ----------------------
+    out : array_like (runs, samples)
+        LED output u[k], written after the reading y[k] (nan padded)
+    photoresistance : array_like (runs, samples)
+        readings y[k] (nan padded)
+    delta_t : float
+        time between recordings
+    max_delay : int
+        largest delay tested, in samples
+
+    Returns
+    ----------------------
+    model : dict of ndarray (runs,)
+        K, tau, theta (seconds), offset y0 and the rms residual of each run,
+        theta include half a sample for the zero order hold of the output
+    """
+    u = np.atleast_2d(np.asarray(out, dtype=float))
+    y = np.atleast_2d(np.asarray(photoresistance, dtype=float))
+    runs, T = y.shape
+    if T < 5:
+        raise ValueError("the fit need at least 5 samples per run")
+    delays = range(min(max_delay, T - 5) + 1)
+    rms = np.full((len(delays), runs), np.inf)
+    coefs = np.full((len(delays), runs, 3), np.nan)
+
+    for d in delays:
+        #regressors and target of the samples k = d .. T-2
+        X = np.stack((y[:, d:T-1], u[:, :T-1-d], np.ones((runs, T-1-d))), axis=-1)
+        Y = y[:, d+1:]
+        valid = np.isfinite(X).all(axis=-1) & np.isfinite(Y)
+        X = np.where(valid[..., None], X, 0)
+        Y = np.where(valid, Y, 0)
+        XtX = np.einsum('nti,ntj->nij', X, X) + 1e-12*np.eye(3)
+        XtY = np.einsum('nti,nt->ni', X, Y)
+        coefs[d] = np.linalg.solve(XtX, XtY[..., None])[..., 0]
+        residual = Y - np.einsum('nti,ni->nt', X, coefs[d])
+        rms[d] = np.sqrt((residual**2).sum(axis=-1)/np.maximum(valid.sum(axis=-1), 1))
+
+    #first stable delay within 1% of the best stable residual of each run
+    stable = (coefs[..., 0] > 0) & (coefs[..., 0] < 1)
+    rms_stable = np.where(stable, rms, np.inf)
+    best = np.argmax(rms_stable <= 1.01*rms_stable.min(axis=0), axis=0)
+    a, b, c = coefs[best, np.arange(runs)].T
+    stable = stable[best, np.arange(runs)]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        K = np.where(stable, b/(1 - a), np.nan)
+        tau = np.where(stable, -delta_t/np.log(a), np.nan)
+        offset = np.where(stable, c/(1 - a), np.nan)
+    theta = (best + 0.5)*delta_t
+    return {'K': K, 'tau': tau, 'theta': theta, 'offset': offset,\
+            'rms': rms[best, np.arange(runs)]}
+
+
+
+def identify(filenames, max_delay=10):
+    """
+    This function fit the FOPDT model of many PID_LED.save() json files
+
+    Returns
+    ----------------------
+    model : dict of ndarray (runs,)
+        see fit_fopdt
+    """
+    runs = [load_json_run(filename) for filename in filenames]
+    delta_t = np.array([np.median(np.diff(time)) for time, out, y in runs])
+    out = pad([run[1] for run in runs])
+    photoresistance = pad([run[2] for run in runs])
+    #runs with different delta_t are fitted separately
+    model = {key: np.full(len(runs), np.nan) for key in ('K', 'tau', 'theta', 'offset', 'rms')}
+    for dt in np.unique(np.round(delta_t, 9)):
+        index = np.where(np.isclose(delta_t, dt))[0]
+        fitted = fit_fopdt(out[index], photoresistance[index], dt, max_delay)
+        for key in model:
+            model[key][index] = fitted[key]
+    return model
+
+
+
+def tuning_rules(K, tau, theta, rule='simc', tau_c=None):
+    """
+    This function return the gains of an ideal PID controller
+        u = Kc*(e + 1/Ti*integral(e) + Td*de/dt)
+    from the FOPDT model (arrays are accepted).
+
+    Parameters
+    ----------------------
+    K, tau, theta : float or ndarray
+        gain, time constant and dead time of the model
+    rule : str
+        'zn' (Ziegler-Nichols reaction curve), 'cohen-coon', 'imc' (PID) or
+        'simc' (Skogestad PI)
+    tau_c : float
+        closed loop time constant of 'imc' and 'simc', theta by default
+
+    Returns
+    ----------------------
+    Kc, Ti, Td : float or ndarray
+    """
+    K, tau, theta = (np.asarray(x, dtype=float) for x in (K, tau, theta))
+    tau_c = theta if tau_c is None else tau_c
+    if rule == 'zn':
+        return 1.2*tau/(K*theta), 2*theta, 0.5*theta
+    elif rule == 'cohen-coon':
+        r = theta/tau
+        return (1/K)*(1/r)*(4/3 + r/4), theta*(32 + 6*r)/(13 + 8*r), 4*theta/(11 + 2*r)
+    elif rule == 'imc':
+        return (2*tau + theta)/(K*(2*tau_c + theta)), tau + theta/2,\
+                tau*theta/(2*tau + theta)
+    elif rule == 'simc':
+        return tau/(K*(tau_c + theta)), np.minimum(tau, 4*(tau_c + theta)), 0*tau
+    else:
+        raise ValueError("unknown tuning rule " + str(rule))
+
+
+
+def to_incremental(Kc, Ti, Td, delta_t):
+    """
+    This function convert ideal PID gains to the Kp, Ki, Kd of PID_LED.
+    execute_PID increment its output with
+        Kp*e + Ki*sum(e)*delta_t + Kd*(e - e_previous)/delta_t
+    which is the velocity form of a PI controller when
+        Kp = Kc*delta_t/Ti, Ki = 0, Kd = Kc*delta_t
+    Td has no equivalent (it would need the second difference of e) and is
+    not used.
+    """
+    Kc, Ti = np.asarray(Kc, dtype=float), np.asarray(Ti, dtype=float)
+    return Kc*delta_t/Ti, 0*Kc, Kc*delta_t
@@ -0,0 +1,179 @@
+"""
+Duration of each phase of the PID_LED loop, at each iteration
+Polytechnique Montreal
+"""
+
+import os
+import time
+import numpy as np
+
+PHASES = ('wait', 'read', 'compute', 'record', 'write', 'publish', 'stop')
+WAIT, READ, COMPUTE, RECORD, WRITE, PUBLISH, STOP = range(len(PHASES))
+QUANTILES = (0.5, 0.9, 0.99, 1)
+
+
+
+class Loop_timer():
+    def __init__(self, phases=PHASES, capacity=1024, export=None, export_every=10,\
+                    clock=None, ring=False):
+        """
+        The time spent since the previous mark is added to the phase of each
+        mark(), in a preallocated (iterations x phases) array of ns.
+        The loop only check that the timer is not None when it is disabled.
+
+        Parameters
+        ----------------------
+        phases : tuple of str
+            names of the phases, mark() take their index
+        capacity : int
+            number of iterations allocated, doubled when full (kept when ring)
+        export : str
+            file written every export_every iterations and at the end: a
+            Prometheus textfile (.prom) or the durations of all the
+            iterations (.csv)
+        export_every : int
+            number of iterations between the exports
+        clock : object with a monotonic_ns() method
+            time module if None
+        ring : bool
+            keep only the durations of the last capacity iterations (bounded
+            memory for the endless runs), the sums exported stay over all of
+            them
+        """
+        self.phases = tuple(phases)
+        self.index = {name: k for k, name in enumerate(self.phases)}
+        #in ring mode one more row for the present iteration
+        self.durations_ns = np.zeros((max(1, capacity) + bool(ring), len(self.phases)),\
+                                        dtype=np.int64)
+        self.n = 0
+        self.ring = ring
+        self.total_ns = np.zeros(len(self.phases), dtype=np.int64) #sums over all the iterations
+        self.export = export
+        self.export_every = export_every
+        self.exported = 0 #iterations already in the csv file
+        self.clock = time if clock is None else clock
+        self.t = None
+        self.overruns = 0
+
+    def start(self):
+        """
+        this function set the time origin of the first phase
+        """
+        self.t = self.clock.monotonic_ns()
+
+    def mark(self, phase):
+        """
+        this function add the time since the previous mark to the phase (index)
+        """
+        now = self.clock.monotonic_ns()
+        self.durations_ns[self.n % len(self.durations_ns), phase] += now - self.t
+        self.t = now
+
+    def end(self, overruns=0):
+        """
+        this function close the present iteration
+
+        Parameters
+        ----------------------
+        overruns : int
+            overruns of the scheduler so far, exported with the durations
+        """
+        self.overruns = overruns
+        self.total_ns += self.durations_ns[self.n % len(self.durations_ns)]
+        self.n += 1
+        if self.ring:
+            self.durations_ns[self.n % len(self.durations_ns)] = 0
+        elif self.n == len(self.durations_ns):
+            self.durations_ns = np.concatenate((self.durations_ns,\
+                                                np.zeros_like(self.durations_ns)))
+        if self.export is not None and self.n % self.export_every == 0:
+            self.write()
+
+    @property
+    def durations(self):
+        """
+        (iterations, phases) durations in seconds, of the last capacity
+        iterations in ring mode
+        """
+        size = len(self.durations_ns)
+        if self.n < size:
+            return self.durations_ns[:self.n]/1e9
+        return self.durations_ns[np.arange(self.n - size + 1, self.n) % size]/1e9
+
+    def summary(self, bins=20):
+        """
+        This function return for each phase the mean, the percentiles 50,
+        90, 99 and the maximum and a histogram of its durations in seconds,
+        and the same for the whole iteration ('total')
+        """
+        durations = self.durations
+        if self.n == 0:
+            durations = np.zeros((1, len(self.phases)))
+        columns = dict(zip(self.phases, durations.T))
+        columns['total'] = durations.sum(axis=1)
+        summary = {}
+        for name, column in columns.items():
+            counts, edges = np.histogram(column, bins=bins)
+            p50, p90, p99 = np.percentile(column, (50, 90, 99))
+            summary[name] = {'mean': float(column.mean()), 'p50': float(p50), 'p90': float(p90),\
+                                'p99': float(p99), 'max': float(column.max()),\
+                                'histogram': (counts.tolist(), edges.tolist())}
+        return summary
+
+    def print_summary(self):
+        """
+        this function print the percentiles of each phase in ms
+        """
+        print('phase          mean      p50      p90      p99      max   (ms)')
+        for name, stats in self.summary().items():
+            print('%-8s' % name + ''.join('%9.3f' % (1e3*stats[key])\
+                    for key in ('mean', 'p50', 'p90', 'p99', 'max')))
+
+    def write(self):
+        """
+        this function export the durations to the export file
+        """
+        if self.export.endswith('.csv'):
+            self.write_csv(self.export)
+        else:
+            self.write_prometheus(self.export)
+
+    def write_csv(self, filename):
+        """
+        this function append the iterations not yet written, in seconds (in
+        ring mode those already overwritten are lost)
+        """
+        new = self.exported == 0 or not os.path.exists(filename)
+        size = len(self.durations_ns)
+        with open(filename, 'w' if new else 'a') as file:
+            if new:
+                self.exported = 0
+                file.write('iteration,' + ','.join(self.phases) + '\n')
+            for i in range(max(self.exported, self.n - size + 1), self.n):
+                file.write(str(i) + ',' + ','.join('%.9f' % (d/1e9)\
+                            for d in self.durations_ns[i % size]) + '\n')
+        self.exported = self.n
+
+    def write_prometheus(self, filename):
+        """
+        This function write the quantiles of the phases in the Prometheus
+        text format (node_exporter textfile collector), the file is replaced
+        at once so it is never read half written
+        """
+        durations = self.durations
+        lines = ['# HELP pid_led_phase_seconds Duration of the phases of the PID_LED loop',\
+                    '# TYPE pid_led_phase_seconds summary']
+        for k, name in enumerate(self.phases):
+            column = durations[:, k]
+            for q in QUANTILES:
+                value = float(np.quantile(column, q)) if self.n else 0.
+                lines.append('pid_led_phase_seconds{phase="%s",quantile="%g"} %.9f' % (name, q, value))
+            lines.append('pid_led_phase_seconds_sum{phase="%s"} %.9f'\
+                            % (name, self.total_ns[k]/1e9))
+            lines.append('pid_led_phase_seconds_count{phase="%s"} %d' % (name, self.n))
+        lines += ['# HELP pid_led_overruns_total Late readings of the PID_LED loop',\
+                    '# TYPE pid_led_overruns_total counter',\
+                    'pid_led_overruns_total %d' % self.overruns]
+        with open(filename + '.tmp', 'w') as file:
+            file.write('\n'.join(lines) + '\n')
+        os.replace(filename + '.tmp', filename)
@@ -0,0 +1,203 @@
+"""
+Step response metrics (overshoot, rise time, settling time) of PID_LED runs
+Polytechnique Montreal
+"""
+
+import numpy as np
+
+
+
+def step_metrics(time, data, Ref, eps=0.025, min_samples=10):
+    """
+    This function compute dy_max, t_r and t_s as PID_LED.analysis, in one
+    vectorized pass over one run or a 2D batch of runs (runs x samples).
+
+    The settling index is the start of the last run of samples inside the
+    band Ref +- eps, the run must be at least min_samples long.
+
+    Parameters
+    ----------------------
+    time : array_like
+        time of the samples, 1D shared by all the runs or same shape as data
+    data : array_like
+        1D samples of one run or 2D (runs x samples)
+    Ref : float or array_like
+        target value of each run
+    eps : float
+        tolerance for the settling time
+    min_samples : int
+        minimal number of consecutive samples in the band
+
+    Returns
+    ----------------------
+    dy_max, t_r, t_s : ndarray
+        one value per run (0-d for a 1D input), nan when not defined
+    """
+    data = np.asarray(data, dtype=float)
+    time = np.broadcast_to(np.asarray(time, dtype=float), data.shape)
+    Ref = np.asarray(Ref, dtype=float)
+    Ref_col = Ref[..., None]
+    T = data.shape[-1]
+    index = np.arange(T)
+
+    #overshooting
+    dy_max = data.max(axis=-1) - Ref
+
+    #rise time: first sample above the target
+    above = data >= Ref_col
+    has_rise = above.any(axis=-1)
+    i_r = above.argmax(axis=-1)
+    t_r = np.take_along_axis(time, i_r[..., None], axis=-1)[..., 0]
+    t_r = np.where(has_rise, t_r, np.nan)
+
+    #settling time: start of the last run of the in-band mask
+    band = (data < Ref_col + eps) & (data > Ref_col - eps)
+    has_band = band.any(axis=-1)
+    last = T - 1 - band[..., ::-1].argmax(axis=-1)
+    outside = np.where(~band & (index <= last[..., None]), index, -1)
+    start = np.minimum(outside.max(axis=-1) + 1, T - 1) #clipped when no band
+    length = last - start + 1
+    t_s = np.take_along_axis(time, start[..., None], axis=-1)[..., 0] - t_r
+    valid = has_band & has_rise & (length >= min_samples) & (t_s >= 0)
+    t_s = np.where(valid, t_s, np.nan)
+
+    return dy_max, t_r, t_s
+
+
+
+class Step_accumulator():
+    def __init__(self, Ref, eps=0.025, min_samples=10):
+        """
+        Streaming version of step_metrics: each update() cost O(1) and no
+        sample is kept, so the metrics are known during the run (even an
+        endless one) with the same definitions.
+        The error integrals hold each error until the next sample.
+
+        Parameters
+        ----------------------
+        Ref : float
+            target value
+        eps : float
+            tolerance for the settling time
+        min_samples : int
+            minimal number of consecutive samples in the band
+        """
+        self.Ref = Ref
+        self.eps = eps
+        self.min_samples = min_samples
+        self.reset()
+
+    def reset(self):
+        """
+        this function forget all the samples
+        """
+        self.n = 0
+        self.t0 = None
+        self.t = None
+        self.y = None
+        self.y_max = -np.inf
+        self.t_r = None #first time at or above Ref
+        self.t_band = None #start of the last in-band run
+        self.n_band = 0 #length of the last in-band run
+        self.in_band = False
+        self.IAE = 0.
+        self.ISE = 0.
+        self.ITAE = 0.
+
+    def update(self, t, y):
+        """
+        this function add the sample y read at time t
+        """
+        if self.n == 0:
+            self.t0 = t
+        else:
+            dt = t - self.t
+            error = abs(self.Ref - self.y)
+            self.IAE += error*dt
+            self.ISE += error*error*dt
+            self.ITAE += (self.t - self.t0)*error*dt
+        self.n += 1
+        self.t = t
+        self.y = y
+
+        if y > self.y_max:
+            self.y_max = y
+        if self.t_r is None and y >= self.Ref:
+            self.t_r = t
+        if self.Ref - self.eps < y < self.Ref + self.eps:
+            if not self.in_band:
+                self.t_band = t
+                self.n_band = 0
+                self.in_band = True
+            self.n_band += 1
+        else:
+            self.in_band = False
+
+    def snapshot(self):
+        """
+        This function return the present metrics as a dict: dy_max, t_r,
+        t_s (nan when not defined, as step_metrics), the length of the
+        present in-band run (0 when out of the band), IAE, ISE, ITAE, and the
+        number n and time t of the samples seen
+        """
+        t_r = np.nan if self.t_r is None else self.t_r
+        t_s = np.nan
+        if self.t_r is not None and self.n_band >= self.min_samples\
+                and self.t_band >= self.t_r:
+            t_s = self.t_band - self.t_r
+        return {'n': self.n, 't': self.t, 'dy_max': self.y_max - self.Ref, 't_r': t_r,\
+                't_s': t_s, 'in_band': self.n_band if self.in_band else 0,\
+                'IAE': self.IAE, 'ISE': self.ISE, 'ITAE': self.ITAE}
+
+
+
+class Settling_detector():
+    def __init__(self, eps=0.025, min_time=10, hold_time=0):
+        """
+        Stop condition for PID_LED.apply(stop=...) ending the run once the
+        output stayed in the band Ref +- eps for min_time plus hold_time.
+        The metrics are followed by a Step_accumulator (the one of the run,
+        pid.metrics, when it has the same eps and min_time), new at each run
+        (i == 0) so the detector can be reused, and dy_max, t_r, t_s
+        and eps of the controller are set when the run is stopped (same
+        definitions as step_metrics, t_s is None when the band is entered
+        before Ref is reached).
+
+        Parameters
+        ----------------------
+        eps : float
+            tolerance for the settling time
+        min_time : float
+            minimal time in the band for the steady state
+        hold_time : float
+            additional time in the band before stopping
+        """
+        self.eps = eps
+        self.min_time = min_time
+        self.hold_time = hold_time
+        self.metrics = None
+        self.shared = False #self.metrics is pid.metrics, updated by apply()
+        self.triggered = False
+
+    def __call__(self, pid, i):
+        if i == 0 or self.metrics is None:
+            min_samples = int(self.min_time/pid.delta_t)
+            run = pid.metrics
+            self.shared = run is not None and run.Ref == pid.Ref and run.eps == self.eps\
+                            and run.min_samples == min_samples
+            self.metrics = run if self.shared else Step_accumulator(pid.Ref, self.eps, min_samples)
+            self.triggered = False
+        metrics = self.metrics
+        if not self.shared:
+            metrics.update(pid.buffer.last('time'), pid.buffer.last('photoresistance'))
+
+        needed = int(self.min_time/pid.delta_t) + int(self.hold_time/pid.delta_t)
+        self.triggered = metrics.t_r is not None and metrics.in_band\
+                            and metrics.n_band >= max(needed, 1)
+        if self.triggered:
+            t_s = metrics.t_band - metrics.t_r
+            pid.eps = self.eps
+            pid.dy_max = metrics.y_max - pid.Ref
+            pid.t_r = metrics.t_r
+            pid.t_s = t_s if t_s >= 0 else None
+        return self.triggered
@@ -0,0 +1,202 @@
+"""
+PID control of several LED/sensor pairs (up to the 8 MCP3008 channels) in one
+loop, the state of the K controllers is kept in NumPy arrays
+Polytechnique Montreal
+"""
+
+from time import sleep
+import numpy as np
+from PID_scheduler import Rate_scheduler
+from PID_buffer import Run_buffer
+from PID_metrics import step_metrics
+
+
+
+class PID_multi_LED():
+    def __init__(self, leds, sensors, Ref, Kp, Ki = 0, Kd = 0, clock = None):
+        """
+        Parameters
+        ----------------------
+        leds : list of PWMLED() objects from gpiozero
+            controls the led intensity of each channel
+        sensors : list of MCP3008 objects from gpiozero
+            gives the mesured light intensity of each channel
+        Ref, Kp, Ki, Kd : float or array_like
+            target value and gains, one value for all or one per channel
+        clock: object with sleep() and monotonic_ns() methods
+            time module if None (or the Virtual_clock shared by the plants)
+        """
+        #parameters
+        self.leds = list(leds)
+        self.sensors = list(sensors)
+        K = len(self.leds)
+        self.K = K
+        self.Ref, self.Kp, self.Ki, self.Kd = (np.broadcast_to(np.asarray(x, dtype=float), (K,)).copy()\
+                                                for x in (Ref, Kp, Ki, Kd))
+        self.clock = clock
+
+        #for PID loop
+        self.background = np.zeros(K)
+        self.max = np.ones(K)
+        self.previous_error = np.zeros(K)
+        self.sum_error = np.zeros(K)
+        self.present_out = np.zeros(K)
+        self.buffer = None
+        self.duration = None
+        self.delta_t = None
+        self.timing = None
+
+        #for analysis
+        self.dy_max = None
+        self.t_r = None
+        self.t_s = None
+        self.eps = None
+
+
+
+    def wait(self, delay):
+        """
+        this function wait with the clock of the controller
+        """
+        if self.clock is None:
+            sleep(delay)
+        else:
+            self.clock.sleep(delay)
+
+
+
+    def read_all(self):
+        """
+        this function read every channel once
+        """
+        return np.fromiter((sensor.value for sensor in self.sensors), float, self.K)
+
+
+
+    def write_all(self, values):
+        """
+        this function write the output of every channel
+        """
+        for led, value in zip(self.leds, values):
+            led.value = float(value)
+
+
+
+    def calibrate(self):
+        """
+        This function measure the background and maximum of all the channels
+        at once, all the LEDs off then all on (5 s each)
+        """
+        self.write_all(np.zeros(self.K))
+        self.wait(0.5)
+        background = np.zeros(self.K)
+        for i in range(10):
+            background += self.read_all()
+            self.wait(0.5)
+        self.background = background/10
+
+        self.write_all(np.ones(self.K))
+        self.wait(0.5)
+        max = np.zeros(self.K)
+        for i in range(10):
+            max += self.read_all()
+            self.wait(0.5)
+        self.max = max/10
+
+        self.write_all(np.zeros(self.K))
+        self.wait(0.5)
+
+
+
+    def apply(self, duration=120, delta_t=1, bin_size = 5, calibrate = True):
+        """
+        This function excute the K PID loops at a fixed rate: each tick read
+        all the channels, and after bin_size ticks all the loops are updated
+        with one vectorized step and all the outputs are written.
+
+        Parameters
+        ----------------------
+            duration: float
+                recording duration
+            delta_t : float
+                time between recordings
+            bin_size : int
+                number of samples to average for each delta_t
+            calibrate : bool
+                measure the background and maximum before the run
+        """
+        self.duration = duration
+        self.delta_t = delta_t
+        if calibrate:
+            self.calibrate()
+        n_samples = int(duration/delta_t)+1
+        scheduler = Rate_scheduler(delta_t/bin_size, self.clock, n_samples*bin_size)
+        buffer = Run_buffer({'time': np.float64, 'photoresistance': (np.float64, self.K),\
+                                'out': (np.float64, self.K)}, n_samples)
+        self.buffer = buffer
+        span = self.max - self.background
+
+        scheduler.start()
+        for i in range(n_samples):
+            photoresistance = np.zeros(self.K)
+            for j in range(bin_size):
+                t = scheduler.wait()
+                if j == 0:
+                    t_i = t
+                photoresistance += self.read_all()
+            photoresistance = (photoresistance/bin_size - self.background)/span
+            present_error = self.Ref - photoresistance
+            self.sum_error += present_error
+
+            # PID control algorithm, all the channels at once
+            P = self.Kp * present_error
+            I = self.Ki * self.sum_error*self.delta_t
+            D = self.Kd * (present_error - self.previous_error)/self.delta_t
+            self.present_out = np.clip(self.present_out + P+I+D, 0, 1)
+
+            buffer.append(t_i, photoresistance, self.present_out)
+            self.write_all(self.present_out)
+            self.previous_error = present_error
+
+        self.timing = scheduler.report()
+        if self.timing['overruns'] > 0:
+            print("Warning: " + str(self.timing['overruns']) + " readings were late, "\
+                + str(self.timing['skipped']) + " were skipped.")
+
+
+
+    @property
+    def time(self):
+        return self.buffer['time']
+
+    @property
+    def photoresistance(self):
+        """
+        (samples, K) view of the normalized readings
+        """
+        return self.buffer['photoresistance']
+
+    @property
+    def out(self):
+        """
+        (samples, K) view of the LED outputs
+        """
+        return self.buffer['out']
+
+
+
+    def analysis(self, eps=0.025, min_time = 10):
+        """
+        This function compute dy_max, t_r and t_s of every channel (arrays,
+        nan when not defined)
+
+        Parameters
+        --------------------
+        eps : float
+            tolerance for analysis calculation
+        min_time : float
+            minimal time for consideration of steady state
+        """
+        self.eps = eps
+        self.dy_max, self.t_r, self.t_s = step_metrics(self.time, self.photoresistance.T,\
+                                            self.Ref, eps, int(min_time/self.delta_t))
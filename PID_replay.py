@@ -0,0 +1,211 @@
+"""
+Replay of recorded runs through many variants of the PID_LED control law,
+faster than real time
+Polytechnique Montreal
+"""
+
+import math
+import numpy as np
+from PID_identification import load_json_run, load_npz_runs, fit_fopdt
+from PID_metrics import step_metrics
+
+
+
+def pid_state(Kp, Ki=0, Kd=0, Ref=0.5):
+    """
+    this function broadcast the gains and target values to N variants
+    """
+    Kp, Ki, Kd, Ref = np.broadcast_arrays(*(np.asarray(x, dtype=float) for x in (Kp, Ki, Kd, Ref)))
+    return Kp.ravel(), Ki.ravel(), Kd.ravel(), Ref.ravel()
+
+
+
+def replay_open_loop(photoresistance, Kp, Ki=0, Kd=0, Ref=0.5, delta_t=1):
+    """
+    This function feed the same recorded readings to N controllers and return
+    the outputs each one would have written (the readings do not depend on
+    the outputs, use replay_closed_loop for that).
+
+    Parameters
+    ----------------------
+    photoresistance : array_like (samples,)
+        normalized readings of the recorded run
+    Kp, Ki, Kd, Ref : float or array_like
+        gains and target values, broadcast together to N variants
+    delta_t : float
+        time between recordings
+
+    Returns
+    ----------------------
+    out : ndarray (N, samples)
+    """
+    y = np.asarray(photoresistance, dtype=float)
+    Kp, Ki, Kd, Ref = pid_state(Kp, Ki, Kd, Ref)
+    #the errors of all the variants are known in advance
+    error = Ref[:, None] - y[None, :]
+    sum_error = np.cumsum(error, axis=1)
+    previous_error = np.concatenate((np.zeros((len(Ref), 1)), error[:, :-1]), axis=1)
+    increment = Kp[:, None]*error + Ki[:, None]*sum_error*delta_t\
+                + Kd[:, None]*(error - previous_error)/delta_t
+    #only the 0..1 clamp is sequential
+    out = np.empty_like(increment)
+    present_out = np.zeros(len(Ref))
+    for k in range(y.size):
+        present_out = np.clip(present_out + increment[:, k], 0, 1)
+        out[:, k] = present_out
+    return out
+
+
+
+def discrete_model(model, delta_t):
+    """
+    this function return (a, b, d) of y[k+1] = a*y[k] + b*u[k-d] from the
+    K, tau, theta of a fitted FOPDT model (first run if many), a ValueError
+    is raised when the model is not stable (no fit found: nan)
+    """
+    K, tau, theta = (float(np.ravel(model[key])[0]) for key in ('K', 'tau', 'theta'))
+    if not (math.isfinite(K) and math.isfinite(tau) and math.isfinite(theta) and tau > 0):
+        raise ValueError("no stable FOPDT model (K = " + str(K) + ", tau = " + str(tau)\
+                            + "), replay in open loop or give the model")
+    a = math.exp(-delta_t/tau)
+    return a, K*(1 - a), max(int(round(theta/delta_t - 0.5)), 0)
+
+
+
+def disturbance(out, photoresistance, model, delta_t):
+    """
+    This function return the part of the recorded readings not explained by
+    the model and the recorded outputs (ambient light, noise, model error)
+        w[k+1] = y[k+1] - a*y[k] - b*u[k-d]
+    with w[0] = y[0]
+    """
+    a, b, d = discrete_model(model, delta_t)
+    u = np.asarray(out, dtype=float)
+    y = np.asarray(photoresistance, dtype=float)
+    u_delayed = np.concatenate((np.zeros(d), u))[:y.size]
+    w = np.empty_like(y)
+    w[0] = y[0]
+    w[1:] = y[1:] - a*y[:-1] - b*u_delayed[:-1]
+    return w
+
+
+
+def replay_closed_loop(out, photoresistance, Kp, Ki=0, Kd=0, Ref=0.5, delta_t=1,\
+                        model=None, max_delay=10):
+    """
+    This function run N controllers in closed loop on the FOPDT model fitted
+    to the recorded run, driven by the disturbance of the recording: with
+    the recorded gains the recorded readings are found again.
+
+    Parameters
+    ----------------------
+    out, photoresistance : array_like (samples,)
+        LED outputs and normalized readings of the recorded run
+    Kp, Ki, Kd, Ref : float or array_like
+        gains and target values, broadcast together to N variants
+    delta_t : float
+        time between recordings
+    model : dict
+        K, tau, theta of the plant, fitted on the run if None (see
+        PID_identification.fit_fopdt)
+    max_delay : int
+        largest delay tested by the fit, in samples
+
+    Returns
+    ----------------------
+    photoresistance, out : ndarray (N, samples)
+    """
+    if model is None:
+        model = fit_fopdt(out, photoresistance, delta_t, max_delay)
+    a, b, d = discrete_model(model, delta_t)
+    w = disturbance(out, photoresistance, model, delta_t)
+    Kp, Ki, Kd, Ref = pid_state(Kp, Ki, Kd, Ref)
+    N, T = len(Ref), w.size
+
+    y = np.empty((N, T))
+    u = np.empty((N, T))
+    y_k = np.full(N, w[0])
+    sum_error = np.zeros(N)
+    previous_error = np.zeros(N)
+    present_out = np.zeros(N)
+    for k in range(T):
+        y[:, k] = y_k
+        present_error = Ref - y_k
+        sum_error += present_error
+        P = Kp * present_error
+        I = Ki * sum_error*delta_t
+        D = Kd * (present_error - previous_error)/delta_t
+        present_out = np.clip(present_out + P+I+D, 0, 1)
+        u[:, k] = present_out
+        previous_error = present_error
+        if k + 1 < T:
+            u_delayed = u[:, k-d] if k >= d else 0
+            y_k = a*y_k + b*u_delayed + w[k+1]
+    return y, u
+
+
+
+def load_runs(filename, param_file=None):
+    """
+    this function return (time, out, photoresistance) of a PID_LED.save()
+    json file, or of the first run of a TP3_px_vf.py npz file (param_file
+    is then the json of its parameters)
+    """
+    if param_file is None:
+        return load_json_run(filename)
+    time, out, photoresistance = load_npz_runs(filename, param_file)
+    return time, out[0], photoresistance[0]
+
+
+
+def compare(time, out, photoresistance, Kp, Ki=0, Kd=0, Ref=0.5, closed_loop=True,\
+                eps=0.025, min_time=10, model=None):
+    """
+    This function replay a recorded run through N controllers and return
+    their outputs and metrics side by side
+
+    Parameters
+    ----------------------
+    time, out, photoresistance : array_like (samples,)
+        recorded run, see load_runs
+    Kp, Ki, Kd, Ref : float or array_like
+        gains and target values, broadcast together to N variants (see
+        PID_batch.gain_grid)
+    closed_loop : bool
+        replay on the fitted model (True) or feed the recorded readings
+    eps : float
+        tolerance for analysis calculation
+    min_time : float
+        minimal time for consideration of steady state
+    model : dict
+        K, tau, theta of the plant for the closed loop replay
+
+    Returns
+    ----------------------
+    results : dict
+        Kp, Ki, Kd, Ref, photoresistance and out (N, samples), dy_max, t_r,
+        t_s (nan when not defined) and IAE (N,)
+    """
+    time = np.asarray(time, dtype=float)
+    delta_t = float(np.median(np.diff(time)))
+    Kp, Ki, Kd, Ref = pid_state(Kp, Ki, Kd, Ref)
+    if closed_loop:
+        y, u = replay_closed_loop(out, photoresistance, Kp, Ki, Kd, Ref, delta_t, model)
+    else:
+        u = replay_open_loop(photoresistance, Kp, Ki, Kd, Ref, delta_t)
+        y = np.broadcast_to(np.asarray(photoresistance, dtype=float), u.shape)
+    dy_max, t_r, t_s = step_metrics(time, y, Ref, eps, int(min_time/delta_t))
+    return {'Kp': Kp, 'Ki': Ki, 'Kd': Kd, 'Ref': Ref, 'photoresistance': y, 'out': u,\
+            'dy_max': dy_max, 't_r': t_r, 't_s': t_s,\
+            'IAE': np.abs(Ref[:, None] - y).sum(axis=1)*delta_t}
+
+
+
+def report(results):
+    """
+    this function print the metrics of the variants, one line each
+    """
+    keys = ('Kp', 'Ki', 'Kd', 'Ref', 'dy_max', 't_r', 't_s', 'IAE')
+    print(' '.join('%10s' % key for key in keys))
+    for k in range(len(results['Kp'])):
+        print(' '.join('%10.4g' % results[key][k] for key in keys))
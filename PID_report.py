@@ -0,0 +1,196 @@
+"""
+Headless rendering of the figures of the runs in a process pool, the figures
+whose data did not change are not rendered again
+Polytechnique Montreal
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from PID_viewer import main_hidden
+
+MANIFEST = 'report_manifest.json'
+DRAFT_DPI = 72
+
+
+
+def figure(name, title=None, xlabel='Temps (s)', ylabel='Amplitude', xlim=None, ylim=None,\
+            legend=None, fontsize=None, figsize=None, formats=('eps', 'png'), dpi=600,\
+            **savefig):
+    """
+    This function return the description of a figure (plain data, sent to the
+    rendering processes), the curves are added with plot()
+
+    Parameters
+    ----------------------
+    name : str
+        file name without extension
+    title, xlabel, ylabel : str
+        texts of the figure
+    xlim, ylim : (float, float)
+        limits of the axes
+    legend : list of str
+        legend of the curves in order, as plt.legend(list), none if None
+    fontsize : float
+        size of the labels and of the legend
+    figsize : (float, float)
+        size of the figure in inches
+    formats : tuple of str
+        files written, 'eps', 'png', 'pdf', ...
+    dpi : float
+        resolution of the bitmap formats
+    savefig :
+        other arguments of savefig, bbox_inches='tight' for example
+    """
+    return {'name': name, 'title': title, 'xlabel': xlabel, 'ylabel': ylabel, 'xlim': xlim,\
+            'ylim': ylim, 'legend': legend, 'fontsize': fontsize, 'figsize': figsize,\
+            'formats': tuple(formats), 'dpi': dpi, 'savefig': savefig, 'lines': []}
+
+
+
+def plot(spec, x, y, fmt='', **kwargs):
+    """
+    this function add a curve to a figure, with the arguments of plt.plot
+    """
+    spec['lines'].append((np.asarray(x, dtype=float), np.asarray(y, dtype=float), fmt, kwargs))
+    return spec
+
+
+
+def run_figure(name, pid, title=None, formats=('png',), dpi=150):
+    """
+    This function return the figure of one run of a PID_LED object: the
+    readings, the LED output and the target value with its tolerance
+    """
+    spec = figure(name, title, xlim=[0, pid.duration], ylim=[0, 1], formats=formats, dpi=dpi,\
+                    bbox_inches='tight')
+    plot(spec, pid.time, pid.photoresistance, label='Photorésistance')
+    plot(spec, pid.time, pid.out, label='LED')
+    plot(spec, [0, pid.duration], [pid.Ref, pid.Ref], 'k--', label='Valeur cible')
+    if pid.eps is not None:
+        plot(spec, [0, pid.duration], [pid.Ref + pid.eps]*2, 'r--', label='_nolegend_')
+        plot(spec, [0, pid.duration], [pid.Ref - pid.eps]*2, 'r--', label='Tolérance')
+    spec['legend'] = True
+    return spec
+
+
+
+def spec_key(spec, draft=False):
+    """
+    this function return a digest of the figure description and its data
+    """
+    return hashlib.blake2b(pickle.dumps((spec, draft), protocol=4), digest_size=16).hexdigest()
+
+
+
+def outputs(spec, directory='.', draft=False):
+    """
+    this function return the files written for a figure
+    """
+    formats = ('png',) if draft else spec['formats']
+    return [os.path.join(directory, spec['name'] + '.' + extension) for extension in formats]
+
+
+
+def render_figure(spec, directory='.', draft=False):
+    """
+    This function draw and save one figure with the Agg canvas of a
+    matplotlib Figure (pyplot is not used, so it work in any process and
+    whatever the backend). In draft mode only a low resolution png is saved.
+    """
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=spec['figsize'])
+    ax = fig.add_subplot()
+    for x, y, fmt, kwargs in spec['lines']:
+        ax.plot(x, y, fmt, **kwargs)
+    if spec['xlim'] is not None:
+        ax.set_xlim(spec['xlim'])
+    if spec['ylim'] is not None:
+        ax.set_ylim(spec['ylim'])
+    ax.set_xlabel(spec['xlabel'], fontsize=spec['fontsize'])
+    ax.set_ylabel(spec['ylabel'], fontsize=spec['fontsize'])
+    if spec['title'] is not None:
+        ax.set_title(spec['title'])
+    if spec['legend'] is True:
+        ax.legend(fontsize=spec['fontsize'])
+    elif spec['legend'] is not None:
+        ax.legend(spec['legend'], fontsize=spec['fontsize'])
+
+    files = outputs(spec, directory, draft)
+    for filename in files:
+        fig.savefig(filename, dpi=DRAFT_DPI if draft else spec['dpi'], **spec['savefig'])
+    return files
+
+
+
+def render_report(specs, directory='.', draft=False, max_workers=None, manifest=MANIFEST,\
+                    verbose=True):
+    """
+    This function render the figures in parallel, except those whose
+    description and data did not change since the last report (their digest
+    is kept in the manifest file of the directory)
+
+    Parameters
+    ----------------------
+    specs : list of dict
+        figures, see figure() and run_figure()
+    directory : str
+        directory of the figures and of the manifest
+    draft : bool
+        quick low resolution png only
+    max_workers : int
+        number of processes, os.cpu_count() if None (1: no pool)
+    manifest : str
+        name of the manifest file, None to render all the figures
+
+    Returns
+    ----------------------
+    rendered : list of str
+        names of the figures rendered
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = None if manifest is None else os.path.join(directory, manifest)
+    done = {}
+    if path is not None and os.path.exists(path):
+        with open(path) as file:
+            done = json.load(file)
+
+    todo = []
+    for spec in specs:
+        key = spec_key(spec, draft)
+        if done.get(spec['name']) == key\
+                and all(os.path.exists(f) for f in outputs(spec, directory, draft)):
+            continue
+        todo.append((spec, key))
+    if verbose:
+        print(str(len(todo)) + " figures to render, " + str(len(specs) - len(todo))\
+                + " unchanged")
+
+    rendered = []
+    try:
+        if len(todo) <= 1 or max_workers == 1:
+            for spec, key in todo:
+                render_figure(spec, directory, draft)
+                done[spec['name']] = key
+                rendered.append(spec['name'])
+        else:
+            #spawn: no GUI state inherited from the parent
+            with main_hidden(), ProcessPoolExecutor(max_workers=max_workers,\
+                                    mp_context=mp.get_context('spawn')) as executor:
+                futures = {executor.submit(render_figure, spec, directory, draft): (spec, key)\
+                            for spec, key in todo}
+                for future in as_completed(futures):
+                    spec, key = futures[future]
+                    future.result()
+                    done[spec['name']] = key
+                    rendered.append(spec['name'])
+    finally:
+        if path is not None:
+            with open(path, 'w') as file:
+                json.dump(done, file, indent=1)
+    return rendered
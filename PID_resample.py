@@ -0,0 +1,127 @@
+"""
+Resampling of one or many series on a new time grid, with a cache of the
+fitted splines
+Polytechnique Montreal
+"""
+
+import hashlib
+from collections import OrderedDict
+import numpy as np
+
+ORDERS = {'slinear': 1, 'quadratic': 2, 'cubic': 3}
+
+
+
+def data_key(time, data):
+    """
+    this function return a digest of the time and data arrays
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for array in (time, data):
+        array = np.ascontiguousarray(array, dtype=float)
+        digest.update(str(array.shape).encode())
+        digest.update(array.data)
+    return digest.hexdigest()
+
+
+
+def linear(time, data, time_new):
+    """
+    This function interpolate linearly each row of data (np.interp for one
+    series, the same indices and weights for all the rows of a 2D array)
+    """
+    if data.ndim == 1:
+        return np.interp(time_new, time, data)
+    index = np.clip(np.searchsorted(time, time_new, side='right') - 1, 0, len(time) - 2)
+    weight = (time_new - time[index])/(time[index + 1] - time[index])
+    return data[..., index]*(1 - weight) + data[..., index + 1]*weight
+
+
+
+class Resampler():
+    def __init__(self, maxsize=32):
+        """
+        One spline is fitted over all the rows of a (series x samples) array
+        and kept for the next calls with the same data.
+
+        Parameters
+        ----------------------
+        maxsize : int
+            number of splines kept, the least recently used is removed
+        """
+        self.maxsize = maxsize
+        self.splines = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def spline(self, time, data, kind='cubic', key=None):
+        """
+        This function return the spline of kind fitted along the last axis of
+        data, from the cache when the same key (data_key by default, or any
+        hashable such as a buffer version) was already fitted
+        """
+        from scipy.interpolate import make_interp_spline
+
+        if kind not in ORDERS:
+            raise ValueError("unknown interpolation kind " + str(kind) + ", use 'linear', "\
+                                + ', '.join("'" + name + "'" for name in ORDERS))
+        key = (data_key(time, data) if key is None else key, kind)
+        spline = self.splines.get(key)
+        if spline is not None:
+            self.splines.move_to_end(key)
+            self.hits += 1
+            return spline
+        self.misses += 1
+        spline = make_interp_spline(time, data, k=ORDERS[kind], axis=-1)
+        self.splines[key] = spline
+        if len(self.splines) > self.maxsize:
+            self.splines.popitem(last=False)
+        return spline
+
+    def resample(self, time, data, time_new=None, factor=5, kind='cubic', key=None):
+        """
+        This function resample one series or each row of a 2D array
+
+        Parameters
+        ----------------------
+        time : array_like (samples,)
+            increasing time of the samples
+        data : array_like (samples,) or (series, samples)
+            values to resample
+        time_new : array_like
+            new time grid, factor times more points over the same interval
+            if None
+        factor : int or float
+            interpolation factor when time_new is None
+        kind : str
+            'linear' (no spline, np.interp), 'slinear', 'quadratic' or 'cubic'
+            (not-a-knot spline, as interp1d)
+        key : hashable
+            cache key of (time, data), a digest of the arrays if None
+
+        Returns
+        ----------------------
+        data_new : ndarray (..., len(time_new))
+            a new array, the rows of a 2D result are views of it
+        """
+        time = np.asarray(time, dtype=float)
+        data = np.asarray(data, dtype=float)
+        if time_new is None:
+            time_new = np.linspace(time[0], time[-1], int(factor*len(time)))
+        time_new = np.asarray(time_new, dtype=float)
+        if kind == 'linear':
+            return linear(time, data, time_new)
+        return self.spline(time, data, kind, key)(time_new)
+
+
+
+#resampler shared by the module functions
+cache = Resampler()
+
+
+
+def resample(time, data, time_new=None, factor=5, kind='cubic', key=None):
+    """
+    this function resample with the shared cache, see Resampler.resample
+    """
+    return cache.resample(time, data, time_new, factor, kind, key)
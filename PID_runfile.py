@@ -0,0 +1,158 @@
+"""
+Chunked binary run file, appended to during the acquisition
+Polytechnique Montreal
+
+Layout: 8 bytes magic, 4 bytes header length and the JSON header in a fixed
+HEADER_SIZE region (rewritable in place), then the samples as blocks of
+little-endian records. A file being written can be read at any time, only
+the complete records are mapped.
+"""
+
+import json
+import os
+import struct
+import time
+import numpy as np
+
+MAGIC = b'PIDLED\x00\x01'
+HEADER_SIZE = 4096
+EXTENSION = '.pidrun'
+FIELDS = (('time', '<f8'), ('photoresistance', '<f8'), ('out', '<f8'))
+
+
+
+def pack_header(header):
+    """
+    this function return the header region as bytes
+    """
+    text = json.dumps(header).encode('utf-8')
+    if len(text) > HEADER_SIZE - len(MAGIC) - 4:
+        raise ValueError("header too large for the " + str(HEADER_SIZE) + " bytes region")
+    region = MAGIC + struct.pack('<I', len(text)) + text
+    return region + b'\x00'*(HEADER_SIZE - len(region))
+
+
+
+def read_header(filename):
+    """
+    this function return the header dict of a run file
+    """
+    with open(filename, 'rb') as file:
+        region = file.read(HEADER_SIZE)
+    if region[:len(MAGIC)] != MAGIC:
+        raise ValueError(filename + " is not a run file")
+    length, = struct.unpack('<I', region[len(MAGIC):len(MAGIC)+4])
+    return json.loads(region[len(MAGIC)+4:len(MAGIC)+4+length].decode('utf-8'))
+
+
+
+def update_header(filename, **values):
+    """
+    this function rewrite the header in place with updated values
+    (for example eps and the analysis results after the run)
+    """
+    header = read_header(filename)
+    header.update(values)
+    with open(filename, 'r+b') as file:
+        file.write(pack_header(header))
+
+
+
+def load_run(filename):
+    """
+    This function map the samples of a run file without parsing them
+
+    Returns
+    ----------------------
+    header : dict
+        gains, Ref, background, max, eps, ... of the run
+    records : np.memmap
+        structured array, records['time'] is a view of the time column
+    """
+    header = read_header(filename)
+    dtype = np.dtype([tuple(field) for field in header['fields']])
+    n = (os.path.getsize(filename) - HEADER_SIZE)//dtype.itemsize
+    if n <= 0:
+        return header, np.zeros(0, dtype=dtype)
+    return header, np.memmap(filename, dtype=dtype, mode='r', offset=HEADER_SIZE, shape=(n,))
+
+
+
+class Run_writer():
+    def __init__(self, filename, header, fields=FIELDS, block_size=64, fsync=False,\
+                    flush_interval=1., clock=None):
+        """
+        The samples are gathered in a preallocated block and written to the
+        file each time the block is full or flush_interval seconds after the
+        previous write, at most block_size-1 samples or flush_interval seconds
+        of samples are lost on a crash (and a reader of the file lag as much).
+
+        Parameters
+        ----------------------
+        filename : str
+            run file name
+        header : dict
+            values saved in the header
+        fields : sequence of (name, dtype)
+            columns of the records, in the order of append()
+        block_size : int
+            number of records per block
+        fsync : bool
+            force the block to the disk after each write (power loss)
+        flush_interval : float
+            maximal time between two writes in seconds, only full blocks are
+            written if None
+        clock : object with a monotonic_ns() method
+            time module if None (or a Virtual_clock)
+        """
+        self.filename = filename
+        self.dtype = np.dtype(list(fields))
+        self.block = np.zeros(block_size, dtype=self.dtype)
+        self.n = 0
+        self.fsync = fsync
+        self.clock = time if clock is None else clock
+        self.flush_interval_ns = None if flush_interval is None else int(flush_interval*1e9)
+        self.flushed = self.clock.monotonic_ns()
+        header = dict(header, fields=[[name, self.dtype[name].str] for name in self.dtype.names],\
+                        block_size=block_size)
+        self.file = open(filename, 'wb')
+        self.file.write(pack_header(header))
+        self.file.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def append(self, *values):
+        """
+        this function add one record, values are in the order of the fields
+        """
+        self.block[self.n] = values
+        self.n += 1
+        if self.n == len(self.block):
+            self.flush()
+        elif self.flush_interval_ns is not None\
+                and self.clock.monotonic_ns() - self.flushed >= self.flush_interval_ns:
+            self.flush()
+
+    def flush(self):
+        """
+        this function write the pending records (a short block if not full)
+        """
+        if self.n > 0:
+            self.file.write(self.block[:self.n].tobytes())
+            self.n = 0
+        self.file.flush()
+        if self.fsync:
+            os.fsync(self.file.fileno())
+        self.flushed = self.clock.monotonic_ns()
+
+    def close(self):
+        """
+        this function write the last records and close the file
+        """
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
@@ -0,0 +1,103 @@
+"""
+Fixed-rate scheduler on absolute deadlines for the PID_LED control loop
+Polytechnique Montreal
+"""
+
+import time
+import numpy as np
+
+
+
+class Rate_scheduler():
+    def __init__(self, period, clock=None, n_ticks=1024, ring=False):
+        """
+        The ticks are on the grid t0 + k*period, so the time spent between
+        two calls of wait() is absorbed instead of adding to the period.
+
+        Parameters
+        ----------------------
+        period : float
+            time between two ticks in seconds
+        clock : object with monotonic_ns() and sleep() methods
+            time module if None (or a Virtual_clock)
+        n_ticks : int
+            expected number of ticks, the jitter storage grows if exceeded
+        ring : bool
+            keep only the jitter of the last n_ticks ticks (bounded memory
+            for the endless runs)
+        """
+        self.period_ns = int(round(period*1e9))
+        self.clock = time if clock is None else clock
+        self.jitter_ns = np.zeros(max(1, n_ticks), dtype=np.int64)
+        self.ring = ring
+        self.t0 = None
+        self.k = 0
+        self.ticks = 0
+        self.overruns = 0
+        self.skipped = 0
+
+
+
+    def start(self):
+        """
+        this function set the first deadline to now
+        """
+        self.t0 = self.clock.monotonic_ns()
+        self.k = 0
+        self.ticks = 0
+        self.overruns = 0
+        self.skipped = 0
+
+
+
+    def wait(self):
+        """
+        this function wait for the next deadline and return the true time of
+        the tick in seconds since start()
+
+        A call arriving after its deadline is an overrun, if a whole period is
+        missed the deadlines skip ahead on the same grid.
+        """
+        deadline = self.t0 + self.k*self.period_ns
+        now = self.clock.monotonic_ns()
+        if now < deadline:
+            self.clock.sleep((deadline - now)/1e9)
+            now = self.clock.monotonic_ns()
+        elif now > deadline:
+            self.overruns += 1
+            missed = (now - deadline)//self.period_ns
+            if missed > 0:
+                self.skipped += missed
+                self.k += missed
+                deadline += missed*self.period_ns
+
+        if self.ticks == len(self.jitter_ns) and not self.ring:
+            self.jitter_ns = np.concatenate((self.jitter_ns, np.zeros_like(self.jitter_ns)))
+        self.jitter_ns[self.ticks % len(self.jitter_ns)] = now - deadline
+        self.ticks += 1
+        self.k += 1
+        return (now - self.t0)/1e9
+
+
+
+    def report(self, bins=20):
+        """
+        this function return the overruns and the jitter statistics in seconds
+
+        Parameters
+        ----------------------
+        bins : int
+            number of bins of the jitter histogram
+        """
+        jitter = self.jitter_ns[:min(self.ticks, len(self.jitter_ns))]/1e9
+        if self.ticks == 0:
+            jitter = np.zeros(1)
+        counts, edges = np.histogram(jitter, bins=bins)
+        return {'period': self.period_ns/1e9,
+                'ticks': self.ticks,
+                'overruns': self.overruns,
+                'skipped': self.skipped,
+                'jitter_mean': float(np.mean(jitter)),
+                'jitter_p99': float(np.percentile(jitter, 99)),
+                'jitter_max': float(np.max(jitter)),
+                'histogram': (counts.tolist(), edges.tolist())}
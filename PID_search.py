@@ -0,0 +1,192 @@
+"""
+Adaptive search of the PID gains with early termination of bad runs
+(successive halving and Hyperband), on the rig or on the simulated plant
+Polytechnique Montreal
+"""
+
+import math
+import numpy as np
+from PID_LED import PID_LED
+from PID_LED_sim import LED_plant
+
+
+
+class Early_stop():
+    def __init__(self, saturation_time=10, oscillation=0.2, max_crossings=6):
+        """
+        Stop condition for PID_LED.apply(stop=...) ending the runs which are
+        already bad: the LED output stuck at 0 or 1, or a large oscillation
+        around Ref.
+
+        Parameters
+        ----------------------
+        saturation_time : float
+            maximal time with the output saturated at 0 or 1 in seconds
+        oscillation : float
+            minimal error amplitude of a half cycle counted as oscillation
+        max_crossings : int
+            number of large crossings of Ref before stopping
+        """
+        self.saturation_time = saturation_time
+        self.oscillation = oscillation
+        self.max_crossings = max_crossings
+        self.saturated = 0
+        self.sign = 0
+        self.peak = 0
+        self.crossings = 0
+        self.triggered = False
+
+    def __call__(self, pid, i):
+        #previous_error is the error of the iteration just done
+        error = pid.previous_error
+        if pid.present_out <= 0 or pid.present_out >= 1:
+            self.saturated += 1
+        else:
+            self.saturated = 0
+
+        sign = 1 if error > 0 else -1
+        if sign != self.sign:
+            if self.peak > self.oscillation:
+                self.crossings += 1
+            self.sign = sign
+            self.peak = 0
+        self.peak = max(self.peak, abs(error))
+
+        self.triggered = self.saturated*pid.delta_t >= self.saturation_time\
+                            or self.crossings >= self.max_crossings
+        return self.triggered
+
+
+
+def make_evaluator(devices, delta_t=1, bin_size=5, calibration=None, **stop_kwargs):
+    """
+    This function return evaluate(params, duration) which run PID_LED with the
+    params and return its score: the mean absolute error to Ref, inf if the
+    run was stopped by Early_stop.
+
+    Parameters
+    ----------------------
+    devices : callable
+        return (led, sensor, clock) for a new run, see sim_devices or
+        lambda: (led, sensor, None) for the rig
+    delta_t : float
+        time between recordings
+    bin_size : int
+        number of samples to average for each delta_t
+    calibration : Calibration_cache
+        calibration shared by the runs on the rig (the LED and sensor do not
+        change), otherwise each run start with a full calibration
+    stop_kwargs :
+        parameters of Early_stop
+    """
+    def evaluate(params, duration):
+        led, sensor, clock = devices()
+        pid = PID_LED(led, sensor, params['Ref'], params['Kp'], params['Ki'], params['Kd'],\
+                        clock=clock, calibration=calibration)
+        stop = Early_stop(**stop_kwargs)
+        pid.apply(duration, delta_t, bin_size, live=False, stop=stop)
+        led.value = 0
+        if stop.triggered:
+            return math.inf
+        return float(np.mean(np.abs(pid.Ref - pid.photoresistance_raw)))
+    return evaluate
+
+
+
+def sim_devices(seed=None, **plant):
+    """
+    this function return a devices() callable creating a new simulated plant
+    for each run (seeds seed, seed+1, ... if seed is given)
+    """
+    count = [0]
+    def devices():
+        sim = LED_plant(seed=None if seed is None else seed + count[0], **plant)
+        count[0] += 1
+        return sim.led, sim.sensor, sim.clock
+    return devices
+
+
+
+def sample_configs(n, Kp=(0, 0.5), Ki=(0, 0.05), Kd=(0, 1), Ref=0.5, rng=None):
+    """
+    this function return n configurations drawn uniformly in the bounds
+    """
+    rng = np.random.default_rng(rng)
+    return [{'Kp': rng.uniform(*Kp), 'Ki': rng.uniform(*Ki), 'Kd': rng.uniform(*Kd),\
+                'Ref': Ref} for i in range(n)]
+
+
+
+def successive_halving(evaluate, configs, min_duration=10, max_duration=270, eta=3,\
+                        verbose=True):
+    """
+    This function run all the configurations for min_duration, keep the best
+    1/eta of them, run them again eta times longer, and so on until one is
+    left or max_duration is reached.
+
+    Parameters
+    ----------------------
+    evaluate : callable
+        evaluate(params, duration) return a score, lower is better
+    configs : list of dict
+        Kp, Ki, Kd and Ref of each configuration
+    min_duration, max_duration : float
+        duration of the first and of the last round in seconds
+    eta : int
+        reduction factor between the rounds
+
+    Returns
+    ----------------------
+    best : dict
+        best configuration of the last round, with its score
+    history : list of (duration, params, score)
+    """
+    history = []
+    duration = min_duration
+    while True:
+        scores = [evaluate(params, duration) for params in configs]
+        history += [(duration, params, score) for params, score in zip(configs, scores)]
+        order = np.argsort(scores)
+        if verbose:
+            print("Round of " + str(duration) + " s: " + str(len(configs))\
+                    + " runs, best score " + str(scores[order[0]]))
+        finite = [configs[k] for k in order if math.isfinite(scores[k])]
+        if len(configs) == 1 or duration >= max_duration or len(finite) <= 1:
+            best = dict(configs[order[0]], score=scores[order[0]])
+            return best, history
+        configs = finite[:max(1, len(configs)//eta)]
+        duration = min(duration*eta, max_duration)
+
+
+
+def hyperband(evaluate, max_duration=270, eta=3, rng=None, verbose=True, **bounds):
+    """
+    This function run brackets of successive halving, from many short runs
+    to a few full length runs, and return the best configuration found.
+
+    Parameters
+    ----------------------
+    evaluate : callable
+        evaluate(params, duration) return a score, lower is better
+    max_duration : float
+        longest run in seconds
+    eta : int
+        reduction factor between the rounds
+    rng : int or Generator
+        seed of the configurations
+    bounds :
+        Kp, Ki, Kd bounds and Ref, see sample_configs
+    """
+    rng = np.random.default_rng(rng)
+    s_max = int(math.log(max_duration)/math.log(eta) + 1e-9) - 1
+    best = None
+    history = []
+    for s in range(max(s_max, 0), -1, -1):
+        n = int(math.ceil((s_max + 1)/(s + 1)*eta**s))
+        configs = sample_configs(n, rng=rng, **bounds)
+        result, bracket = successive_halving(evaluate, configs, max_duration/eta**s,\
+                                                max_duration, eta, verbose)
+        history += bracket
+        if best is None or result['score'] < best['score']:
+            best = result
+    return best, history
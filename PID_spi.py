@@ -0,0 +1,190 @@
+"""
+Burst reading of the MCP3008 with the hardware SPI of the Raspberry Pi: all
+the conversions of a burst are done by a single ioctl of spidev
+Polytechnique Montreal
+"""
+
+import ctypes
+import os
+import numpy as np
+
+FRAME_SIZE = 3 #bytes of one MCP3008 conversion
+MAX_FRAMES = 511 #SPI_IOC_MESSAGE(n) size must fit in 14 bits (32 bytes per transfer)
+SPI_IOC_WR_MODE = 0x40016b01
+SPI_IOC_WR_MAX_SPEED_HZ = 0x40046b04
+
+
+
+class Spi_ioc_transfer(ctypes.Structure):
+    """
+    struct spi_ioc_transfer of linux/spi/spidev.h
+    """
+    _fields_ = [('tx_buf', ctypes.c_uint64), ('rx_buf', ctypes.c_uint64),\
+                ('len', ctypes.c_uint32), ('speed_hz', ctypes.c_uint32),\
+                ('delay_usecs', ctypes.c_uint16), ('bits_per_word', ctypes.c_uint8),\
+                ('cs_change', ctypes.c_uint8), ('tx_nbits', ctypes.c_uint8),\
+                ('rx_nbits', ctypes.c_uint8), ('word_delay_usecs', ctypes.c_uint8),\
+                ('pad', ctypes.c_uint8)]
+
+
+
+def spi_ioc_message(n):
+    """
+    this function return the SPI_IOC_MESSAGE(n) request number
+    """
+    return 0x40000000 | (n*ctypes.sizeof(Spi_ioc_transfer)) << 16 | ord('k') << 8
+
+
+
+def command(channel):
+    """
+    this function return the 3 bytes of a single ended conversion
+    """
+    return bytes((1, 0x80 | channel << 4, 0))
+
+
+
+def decode(rx):
+    """
+    this function return the 10 bit results of (frames, 3) received bytes
+    """
+    return ((rx[:, 1].astype(np.uint16) & 3) << 8) | rx[:, 2]
+
+
+
+class Spidev_transport():
+    def __init__(self, bus=0, device=0, speed_hz=1350000, mode=0):
+        """
+        Hardware SPI through /dev/spidev<bus>.<device>
+
+        Parameters
+        ----------------------
+        bus, device : int
+            SPI bus and chip select (CE0 is device 0)
+        speed_hz : int
+            SPI clock, 1.35 MHz is the maximum of the MCP3008 at 2.7 V
+        mode : int
+            SPI mode (0 or 3 for the MCP3008)
+        """
+        import fcntl
+        self.ioctl = fcntl.ioctl
+        self.speed_hz = speed_hz
+        self.fd = os.open('/dev/spidev' + str(bus) + '.' + str(device), os.O_RDWR)
+        self.ioctl(self.fd, SPI_IOC_WR_MODE, bytes((mode,)))
+        self.ioctl(self.fd, SPI_IOC_WR_MAX_SPEED_HZ, speed_hz.to_bytes(4, 'little'))
+        self.transfers = {} #n: transfer array of the last buffers
+
+    def transfer(self, tx, rx, n):
+        """
+        This function do n conversions of FRAME_SIZE bytes, chip select is
+        released between the frames, MAX_FRAMES frames per ioctl.
+
+        Parameters
+        ----------------------
+        tx, rx : ctypes arrays of n*FRAME_SIZE bytes
+            sent and received bytes
+        n : int
+            number of frames
+        """
+        tx_address, rx_address = ctypes.addressof(tx), ctypes.addressof(rx)
+        for start in range(0, n, MAX_FRAMES):
+            count = min(MAX_FRAMES, n - start)
+            key = (count, tx_address, rx_address, start)
+            transfers = self.transfers.get(key)
+            if transfers is None:
+                transfers = (Spi_ioc_transfer*count)()
+                for k in range(count):
+                    offset = (start + k)*FRAME_SIZE
+                    transfers[k].tx_buf = tx_address + offset
+                    transfers[k].rx_buf = rx_address + offset
+                    transfers[k].len = FRAME_SIZE
+                    transfers[k].speed_hz = self.speed_hz
+                    transfers[k].bits_per_word = 8
+                    transfers[k].cs_change = 1
+                self.transfers[key] = transfers
+            self.ioctl(self.fd, spi_ioc_message(count), transfers)
+
+    def close(self):
+        os.close(self.fd)
+
+
+
+class Loopback_transport():
+    def __init__(self, source=None):
+        """
+        Stand in of the SPI bus answering as a MCP3008
+
+        Parameters
+        ----------------------
+        source : callable
+            source(channel) return the value to convert, between 0 and 1
+            (0 if None), for example the read() of a simulated plant
+        """
+        self.source = (lambda channel: 0.) if source is None else source
+        self.frames = 0
+
+    def transfer(self, tx, rx, n):
+        command = np.frombuffer(tx, dtype=np.uint8, count=n*FRAME_SIZE).reshape(n, FRAME_SIZE)
+        answer = np.frombuffer(rx, dtype=np.uint8, count=n*FRAME_SIZE).reshape(n, FRAME_SIZE)
+        for k in range(n):
+            channel = (command[k, 1] >> 4) & 7
+            value = int(round(min(max(self.source(channel), 0), 1)*1023))
+            answer[k] = (0, value >> 8, value & 0xff)
+        self.frames += n
+
+    def close(self):
+        pass
+
+
+
+class MCP3008_burst():
+    def __init__(self, channel=0, oversample=16, transport=None, **spi_args):
+        """
+        MCP3008 channel read by bursts of conversions. value is the mean of
+        a burst of oversample conversions, so it can replace the gpiozero
+        MCP3008 (with a smaller bin_size).
+
+        Parameters
+        ----------------------
+        channel : int
+            single ended input, 0 to 7
+        oversample : int
+            number of conversions averaged by value
+        transport : Spidev_transport or Loopback_transport
+            SPI bus, a Spidev_transport(**spi_args) if None
+        """
+        self.channel = channel
+        self.oversample = oversample
+        self.transport = Spidev_transport(**spi_args) if transport is None else transport
+        self.buffers = {} #n: (tx, rx) preallocated for the bursts of n frames
+
+    def buffers_of(self, n):
+        """
+        this function return the tx and rx buffers of a burst of n frames
+        """
+        buffers = self.buffers.get(n)
+        if buffers is None:
+            tx = (ctypes.c_uint8*(n*FRAME_SIZE)).from_buffer_copy(command(self.channel)*n)
+            rx = (ctypes.c_uint8*(n*FRAME_SIZE))()
+            buffers = self.buffers[n] = (tx, rx)
+        return buffers
+
+    def read_burst(self, n=None):
+        """
+        This function return n raw conversions (0 to 1023) as a uint16 array,
+        in one transfer
+        """
+        n = self.oversample if n is None else n
+        tx, rx = self.buffers_of(n)
+        self.transport.transfer(tx, rx, n)
+        return decode(np.frombuffer(rx, dtype=np.uint8).reshape(n, FRAME_SIZE))
+
+    @property
+    def value(self):
+        """
+        mean of a burst, between 0 and 1 as gpiozero MCP3008.value
+        """
+        return float(self.read_burst().mean())/1023
+
+    def close(self):
+        self.transport.close()
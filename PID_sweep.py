@@ -0,0 +1,140 @@
+"""
+Parallel parameter sweep of PID_LED on the simulated plant
+Polytechnique Montreal
+"""
+
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from PID_LED import PID_LED
+from PID_LED_sim import LED_plant
+
+
+
+def grid_design(Kp_list, Ki_list=(0,), Kd_list=(0,), Ref_list=(0.5,),
+                    bin_size_list=(5,), delta_t_list=(1,)):
+    """
+    this function return the cartesian design of all the parameter lists
+
+    Returns
+    ----------------------
+    design : list of dict
+        one dict of Kp, Ki, Kd, Ref, bin_size and delta_t per run
+    """
+    names = ('Kp', 'Ki', 'Kd', 'Ref', 'bin_size', 'delta_t')
+    values = (Kp_list, Ki_list, Kd_list, Ref_list, bin_size_list, delta_t_list)
+    return [dict(zip(names, combination)) for combination in itertools.product(*values)]
+
+
+
+def random_design(n, Kp=(0, 0.1), Ki=(0, 0), Kd=(0, 0), Ref=(0.5, 0.5),
+                    bin_size=(5,), delta_t=(1,), seed=None):
+    """
+    this function return a random design of n runs
+
+    Parameters
+    ----------------------
+    n : int
+        number of runs
+    Kp, Ki, Kd, Ref : (float, float)
+        bounds of the uniform distribution of each parameter
+    bin_size, delta_t : sequence
+        values to choose from
+    seed : int
+        seed of the random generator
+    """
+    rng = np.random.default_rng(seed)
+    columns = {name: rng.uniform(low, high, n) for name, (low, high) in\
+                (('Kp', Kp), ('Ki', Ki), ('Kd', Kd), ('Ref', Ref))}
+    columns['bin_size'] = rng.choice(bin_size, n)
+    columns['delta_t'] = rng.choice(delta_t, n)
+    return [{name: column[i].item() for name, column in columns.items()}\
+                for i in range(n)]
+
+
+
+def run_one(params, duration=120, plant=None, seed=None, avg_size=3, factor=5,
+                eps=0.025, min_time=10):
+    """
+    this function execute one run on a new simulated plant and return its
+    dy_max, t_r and t_s
+
+    Parameters
+    ----------------------
+    params : dict
+        Kp, Ki, Kd, Ref, bin_size and delta_t of the run
+    duration: float
+        recording duration
+    plant : dict
+        keyword arguments of LED_plant
+    seed : int
+        seed of the plant noise
+    avg_size, factor, eps, min_time :
+        post processing parameters, see PID_LED.noise_reduction,
+        PID_LED.interpolate and PID_LED.analysis
+    """
+    sim = LED_plant(seed=seed, **(plant or {}))
+    pid = PID_LED(sim.led, sim.sensor, params['Ref'], params['Kp'], params['Ki'],\
+                    params['Kd'], clock=sim.clock)
+    pid.apply(duration, params['delta_t'], int(params['bin_size']), live=False)
+    pid.noise_reduction(avg_size)
+    pid.interpolate(factor)
+    pid.analysis(eps, min_time, verbose=False)
+    return {'dy_max': pid.dy_max, 't_r': pid.t_r, 't_s': pid.t_s}
+
+
+
+def run_chunk(chunk, kwargs):
+    """
+    this function execute a list of (index, params, seed) in a worker process
+    """
+    return [(index, params, run_one(params, seed=seed, **kwargs))\
+                for index, params, seed in chunk]
+
+
+
+def run_sweep(design, duration=120, plant=None, seed=None, max_workers=None,
+                chunksize=None, **kwargs):
+    """
+    This function fan the runs of a design out over a process pool and yield
+    the results as they finish (not in the order of the design).
+
+    Parameters
+    ----------------------
+    design : list of dict
+        runs from grid_design or random_design
+    duration: float
+        recording duration
+    plant : dict
+        keyword arguments of LED_plant
+    seed : int
+        run i uses the noise seed seed + i, None for unseeded noise
+    max_workers : int
+        number of processes, os.cpu_count() if None
+    chunksize : int
+        number of runs sent to a worker at once
+    kwargs :
+        post processing parameters of run_one
+
+    Yields
+    ----------------------
+    index, params, metrics : int, dict, dict
+        position in the design, parameters and {'dy_max', 't_r', 't_s'}
+
+    Note: the caller script needs an if __name__ == '__main__' guard.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    if chunksize is None:
+        #a few chunks per worker to balance the load without much overhead
+        chunksize = max(1, min(16, len(design)//(4*max_workers)))
+    runs = [(i, params, None if seed is None else seed + i)\
+                for i, params in enumerate(design)]
+    chunks = [runs[i:i+chunksize] for i in range(0, len(runs), chunksize)]
+    kwargs = dict(kwargs, duration=duration, plant=plant)
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(run_chunk, chunk, kwargs) for chunk in chunks]
+        for future in as_completed(futures):
+            for result in future.result():
+                yield result
@@ -0,0 +1,168 @@
+"""
+Live display of a PID_LED run in a separate process
+Polytechnique Montreal
+"""
+
+import multiprocessing as mp
+import queue
+import sys
+from contextlib import contextmanager
+from time import sleep, monotonic
+
+
+
+@contextmanager
+def main_hidden():
+    """
+    The processes spawned inside this context do not import the main
+    module: they only need the module of their target, and the scripts
+    (without a __main__ guard) must not be run again.
+    """
+    main = sys.modules['__main__']
+    saved = {key: main.__dict__[key] for key in ('__file__', '__spec__')\
+                if key in main.__dict__}
+    main.__dict__.pop('__file__', None)
+    main.__spec__ = None
+    try:
+        yield
+    finally:
+        main.__dict__.update(saved)
+
+
+
+def viewer_loop(samples, duration, Ref, title, fps):
+    """
+    this function run in the viewer process: it drain the samples sent by the
+    control loop and redraw one persistent line with blitting at fps frames
+    per second, until the None sentinel is received or the window is closed
+    """
+    import numpy as np
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots()
+    ax.axis([0, duration, 0, 1])
+    ax.plot([0, duration], [Ref, Ref], 'k--', label='Target value')
+    line, = ax.plot([], [], 'r.', markersize=4, animated=True)
+    label = ax.text(0.02, 0.98, '', transform=ax.transAxes, va='top', family='monospace',\
+                    animated=True)
+    ax.legend()
+    ax.set_xlabel('Time (s)')
+    ax.set_ylabel('Amplitude')
+    ax.set_title(title)
+    canvas = fig.canvas
+    blit = getattr(canvas, 'supports_blit', False)
+    background = [None]
+
+    def on_draw(event):
+        #the static background is captured again after a resize
+        background[0] = canvas.copy_from_bbox(fig.bbox) if blit else None
+        ax.draw_artist(line)
+        ax.draw_artist(label)
+
+    canvas.mpl_connect('draw_event', on_draw)
+    plt.show(block=False)
+    canvas.draw()
+
+    capacity = 1024
+    t = np.empty(capacity)
+    y = np.empty(capacity)
+    n = 0
+    running = True
+    period = 1/fps
+    next_frame = monotonic()
+    while running and plt.fignum_exists(fig.number):
+        updated = False
+        while True:
+            try:
+                sample = samples.get_nowait()
+            except queue.Empty:
+                break
+            if sample is None:
+                running = False
+                break
+            if n == capacity:
+                capacity *= 2
+                t = np.resize(t, capacity)
+                y = np.resize(y, capacity)
+            t[n], y[n], metrics = sample
+            n += 1
+            if metrics is not None:
+                label.set_text('overshoot %.3f   t_r %.1f s   t_s %.1f s\nIAE %.3f   ISE %.4f'\
+                    % (metrics['dy_max'], metrics['t_r'], metrics['t_s'], metrics['IAE'],\
+                        metrics['ISE']))
+            updated = True
+
+        if updated:
+            line.set_data(t[:n], y[:n])
+            if blit and background[0] is not None:
+                canvas.restore_region(background[0])
+                ax.draw_artist(line)
+                ax.draw_artist(label)
+                canvas.blit(fig.bbox)
+            else:
+                canvas.draw_idle()
+        canvas.flush_events()
+
+        next_frame += period
+        delay = next_frame - monotonic()
+        if delay > 0:
+            sleep(delay)
+        else:
+            next_frame = monotonic()
+    plt.close(fig)
+
+
+
+class Live_viewer():
+    def __init__(self, duration, Ref, title='', fps=10, maxsize=100000):
+        """
+        The control loop only put samples in a queue, the drawing cost is paid
+        by the viewer process at its own frame rate.
+
+        Parameters
+        ----------------------
+        duration : float
+            recording duration, for the axis
+        Ref : float
+            target value of the controler
+        title : str
+            title of the figure
+        fps : float
+            frames per second of the display
+        maxsize : int
+            size of the sample queue, samples are dropped when it is full
+        """
+        context = mp.get_context('spawn')
+        self.samples = context.Queue(maxsize)
+        self.process = context.Process(target=viewer_loop,\
+                        args=(self.samples, duration, Ref, title, fps), daemon=True)
+        self.dropped = 0
+
+    def start(self):
+        """
+        this function start the viewer process
+        """
+        with main_hidden():
+            self.process.start()
+
+    def publish(self, t, y, metrics=None):
+        """
+        this function send one sample to the viewer without blocking, with
+        the Step_accumulator snapshot shown over the plot
+        """
+        try:
+            self.samples.put_nowait((t, y, metrics))
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self, timeout=5):
+        """
+        this function ask the viewer to draw the last samples and stop
+        """
+        try:
+            self.samples.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
@@ -6,14 +6,22 @@ Polytechnique Montreal
 #*****************************************************************************
 #importation of python librairies and connections to rasberry pi
 #*****************************************************************************
-from gpiozero import PWMLED, MCP3008
-from time import sleep
-import matplotlib.pyplot as plt
+from PID_devices import get_board
 import json
 from PID_LED import PID_LED
-#sensor = LightSensor(pin=18, queue_len=5)
-sensor = MCP3008(channel=0, clock_pin=11, mosi_pin=10, miso_pin=9, select_pin=8)
-led = PWMLED(16)
+from PID_report import figure, plot, run_figure, render_report
+from PID_metrics import Settling_detector
+#gpiozero devices, or fakes with PID_LED_BACKEND=sim (or trace) off the Pi
+board = get_board()
+sleep = board.sleep
+#sensor = board.LightSensor(pin=18, queue_len=5)
+#sensor = board.MCP3008_burst(channel=0, oversample=16) #hardware SPI on CE0, bursts of 16
+sensor = board.MCP3008(channel=0, clock_pin=11, mosi_pin=10, miso_pin=9, select_pin=8)
+#from PID_acquisition import Acquisition
+#sensor = Acquisition(sensor, rate=500, decimation=50) #sampled by a thread, apply with bin_size=1
+led = board.PWMLED(16)
+#the same rig is calibrated once, then only checked for drift
+calibration = board.Calibration_cache(validity=600)
 #*****************************************************************************
 
 
@@ -22,6 +30,8 @@ led = PWMLED(16)
 #*****************************************************************************
 duration = 300 # recording duration in seconds
 delta_t = 1 #time between each recording
+hold_time = None #end a run hold_time seconds after it is stable (None: full duration)
+draft = False #quick low resolution png figures only
 
 #*************Parameters for default analysis*********************************
 Ref = 0.5 # target value for LED luminosity
@@ -52,90 +62,94 @@ evaluate = True
 
 #create object list
 if evaluate_kp:
-    LED_list = [PID_LED(led, sensor, Ref, Kp_list[i])\
+    LED_list = [PID_LED(led, sensor, Ref, Kp_list[i], calibration=calibration,\
+                    clock=board.clock)\
                     for i in range(len(Kp_list)) ]
     filenames = ["PID_LED_data_Kp_"+ str(Kp_list[i]).replace('.','_')\
                     for i in range(len(Kp_list))]
 elif evaluate_ki:
-    LED_list = [PID_LED(led, sensor, Ref, Kp, Ki_list[i], Kd)\
+    LED_list = [PID_LED(led, sensor, Ref, Kp, Ki_list[i], Kd, calibration=calibration,\
+                    clock=board.clock)\
                     for i in range(len(Ki_list)) ]
     filenames = ["PID_LED_data_Ki_"+ str(Ki_list[i]).replace('.','_')\
                     for i in range(len(Ki_list))]
 elif evaluate_kd:
-    LED_list = [PID_LED(led, sensor, Ref, Kp, Ki, Kd_list[i])\
+    LED_list = [PID_LED(led, sensor, Ref, Kp, Ki, Kd_list[i], calibration=calibration,\
+                    clock=board.clock)\
                     for i in range(len(Kd_list)) ]
     filenames = ["PID_LED_data_Kd_"+ str(Kd_list[i]).replace('.','_')\
                     for i in range(len(Kd_list))]
 elif evaluate_ref:
-    LED_list = [PID_LED(led, sensor, Ref_list[i], Kp, Ki, Kd)\
+    LED_list = [PID_LED(led, sensor, Ref_list[i], Kp, Ki, Kd, calibration=calibration,\
+                    clock=board.clock)\
                     for i in range(len(Ref_list)) ]
     filenames = ["PID_LED_data_Ref_"+ str(Ref_list[i]).replace('.','_')\
                     for i in range(len(Ref_list))]
 elif evaluate:
-    LED_list = [PID_LED(led, sensor, Ref, Kp, Ki, Kd)]
+    LED_list = [PID_LED(led, sensor, Ref, Kp, Ki, Kd, calibration=calibration,\
+                    clock=board.clock)]
     filenames = ["PID_LED_data"]
 
 
 for i in range(len(LED_list)):
     led.value = 0 #reset LED to off
     print("Évaluation du paramètre numéro " + str(i+1))
-    LED_list[i].apply(duration, delta_t) #run the PID
+    stop = None if hold_time is None else Settling_detector(hold_time = hold_time)
+    LED_list[i].apply(duration, delta_t, stop = stop) #run the PID
     LED_list[i].noise_reduction()
     LED_list[i].interpolate()
     LED_list[i].analysis()
     LED_list[i].save(filenames[i]) # save data
     sleep(1)
 
-#plot result
-fig = plt.figure()
-plt.xlim([0, LED_list[0].duration])
-plt.ylim([0, 1])
-plt.xlabel('Temps (s)')
-plt.ylabel('Amplitude')
-#use the plot_photoresistance from PID_LED class
+#plot result, each figure is rendered in its own process, unchanged ones are skipped
+first = LED_list[0]
+spec = figure('', xlim=[0, first.duration], ylim=[0, 1], bbox_inches = 'tight')
 for i in range(len(LED_list)):
-    LED_list[i].plot(linewidth = 2)
+    plot(spec, LED_list[i].time, LED_list[i].photoresistance, linewidth = 2)
 if evaluate_kp:
-    plt.title('Effet la variation de Kp avec ' + 'Ki = ' + str(LED_list[0].Ki) \
-                + ' et Kd = '+ str(LED_list[0].Kd))
+    spec['title'] = 'Effet la variation de Kp avec ' + 'Ki = ' + str(first.Ki) \
+                + ' et Kd = '+ str(first.Kd)
     legend = (['Kp = '+ str(val) for val in Kp_list])
-    plt.plot([0, LED_list[0].duration], [LED_list[0].Ref, LED_list[0].Ref],'k--')
+    plot(spec, [0, first.duration], [first.Ref, first.Ref],'k--')
     legend.append('Valeur cible')
     save_file_name = 'Courbe_PID_analyse_kp'
 elif evaluate_ki:
-    plt.title('Effet la variation de Ki avec ' + 'Kp = ' + str(LED_list[0].Kp) \
-                + ' et Kd = ' + str(LED_list[0].Kd) )
+    spec['title'] = 'Effet la variation de Ki avec ' + 'Kp = ' + str(first.Kp) \
+                + ' et Kd = ' + str(first.Kd)
     legend = (['Ki = '+ str(val) for val in Ki_list])
-    plt.plot([0, LED_list[0].duration], [LED_list[0].Ref, LED_list[0].Ref],'k--')
+    plot(spec, [0, first.duration], [first.Ref, first.Ref],'k--')
     legend.append('Valeur cible')
     save_file_name = 'Courbe_PID_analyse_ki'
 elif evaluate_kd:
-    plt.title('Effet la variation de Kd avec ' + 'Kp = ' + str(LED_list[0].Kp) \
-                + ' et Ki = ' + str(LED_list[0].Ki))
+    spec['title'] = 'Effet la variation de Kd avec ' + 'Kp = ' + str(first.Kp) \
+                + ' et Ki = ' + str(first.Ki)
     legend = (['Kd = '+ str(val) for val in Kd_list])
-    plt.plot([0, LED_list[0].duration], [LED_list[0].Ref, LED_list[0].Ref],'k--')
+    plot(spec, [0, first.duration], [first.Ref, first.Ref],'k--')
     legend.append('Valeur cible')
     save_file_name = 'Courbe_PID_analyse_kd'
 elif evaluate_ref:
-    plt.title("Efficacité du contrôleur PID avec Kp = " + str(LED_list[0].Kp) \
-                + ', ' + 'Ki = ' + str(LED_list[0].Ki)+' et Kd = ' + \
-                str(LED_list[0].Kd))
+    spec['title'] = "Efficacité du contrôleur PID avec Kp = " + str(first.Kp) \
+                + ', ' + 'Ki = ' + str(first.Ki)+' et Kd = ' + \
+                str(first.Kd)
     legend = (['Valeur cible = '+ str(val) for val in Ref_list])
     for Ref in Ref_list:
-        plt.plot([0, duration], [Ref, Ref],'k--')
+        plot(spec, [0, duration], [Ref, Ref],'k--')
     save_file_name = 'Courbe_PID_analyse_ref'
 elif evaluate:
-    #plt.title("Efficacité du contrôleur PID avec Kp = " + str(LED_list[0].Kp) \
-    #            + ', ' + 'Ki = ' + str(LED_list[0].Ki) + ' et Kd = ' + \
-    #            str(LED_list[0].Kd))
-    plt.plot([0, LED_list[0].duration], [LED_list[0].Ref, LED_list[0].Ref],'k--')
-    plt.plot([0, LED_list[0].duration], [LED_list[0].Ref + LED_list[0].eps, \
-                    LED_list[0].Ref + LED_list[0].eps],'r--')
-    plt.plot([0, LED_list[0].duration], [LED_list[0].Ref - LED_list[0].eps,\
-                    LED_list[0].Ref -  LED_list[0].eps],'r--')
+    #spec['title'] = "Efficacité du contrôleur PID avec Kp = " + str(first.Kp) \
+    #            + ', ' + 'Ki = ' + str(first.Ki) + ' et Kd = ' + \
+    #            str(first.Kd)
+    plot(spec, [0, first.duration], [first.Ref, first.Ref],'k--')
+    plot(spec, [0, first.duration], [first.Ref + first.eps, \
+                    first.Ref + first.eps],'r--')
+    plot(spec, [0, first.duration], [first.Ref - first.eps,\
+                    first.Ref -  first.eps],'r--')
     legend=['Photorésistance','Valeur cible', 'Tolérance']
     save_file_name = 'Courbe_PID_analyse_2cm_final'
-plt.legend(legend)
+spec['legend'] = legend
+spec['name'] = save_file_name
 
-fig.savefig(save_file_name +".eps", bbox_inches = 'tight')
-fig.savefig(save_file_name +".png", bbox_inches = 'tight', dpi = 600)
+#one figure per run (readings and LED output) and the comparison
+specs = [run_figure(filenames[i], LED_list[i]) for i in range(len(LED_list))] + [spec]
+render_report(specs, draft = draft)
@@ -1,15 +1,17 @@
 #*****************************************************************************
 #importation des librairies et connections au rasberry pi
 #*****************************************************************************
-from gpiozero import LightSensor, PWMLED
 from signal import pause
-from time import sleep
-import matplotlib.pyplot as plt
 import numpy as np
-from scipy import interpolate
 import json
-sensor = LightSensor(pin=18, queue_len=5)
-led = PWMLED(16)
+from PID_filter import sliding_avg
+from PID_resample import resample
+from PID_report import figure, plot, render_report
+from PID_devices import get_board
+board = get_board() #PID_LED_BACKEND=sim pour rouler sans le rasberry pi
+sleep = board.sleep
+sensor = board.LightSensor(pin=18, queue_len=5)
+led = board.PWMLED(16)
 #*****************************************************************************
 #*****************************************************************************
 
@@ -140,18 +142,6 @@ def PID_LED(led, sensor, Kp,Ki,Kd, Ref, time, sleep_time, window=9):
 #*****************************************************************************
 
 
-#*********Fonction moyenne glissante  pour lisser les données****************
-def sliding_avg(led_data, moy_size=3):
-    led_moy = []
-    for i in range(len(led_data)+1-moy_size):
-        moy = 0
-        for j in range(moy_size):
-            moy = moy + led_data[i+j]
-        moy = moy/moy_size
-        led_moy.append(moy)
-
-    return led_moy
-#*****************************************************************************
 
 
 
@@ -209,10 +199,8 @@ elif evaluate: #analyse unique
 
 
 #************************Lissage des résultats*******************************
-LEDs_clean = []
-for led_data in LEDs_vect:
-    led_moy = sliding_avg(led_data)
-    LEDs_clean.append(led_moy)
+#toutes les courbes sont lissées en un seul appel (tableau 2D)
+LEDs_clean = sliding_avg(LEDs_vect, 3, padding=False)
 time_clean = np.linspace(0, time, len(LEDs_clean[0]))
 #*****************************************************************************
 #*****************************************************************************
@@ -275,107 +263,58 @@ elif evaluate:
 
 
 
-#*******************visualistion des données brutes**************************
-plt.figure()
-plt.xlabel('Temps (s)')
-plt.ylabel('Amplitude')
-for led_data in LEDs_vect:
-    f = interpolate.interp1d(time_raw, led_data, kind='cubic')
-    time_new = np.linspace(0,time, 5*len(time_raw))
-    plt.plot(time_new, f(time_new))
-legend = []
-
-if not evaluate_ref and not evaluate:
-    for K in K_list:
-        if evaluate_kp:
-            legend.append('Kp = '+ str(K))
-        elif evaluate_ki:
-            legend.append('Ki = '+ str(K))
-        elif evaluate_kd:
-            legend.append('Kd = '+ str(K))
-    plt.plot([0, time], [Ref, Ref],'k--')
-    legend.append('Valeur cible')
-    plt.legend(legend)
-
-    if evaluate_kp:
-        plt.title('Effet la variation de Kp avec '+ 'Ki = '+str(Ki)+' et Kd = '\
-                    +str(Kd))
-        plt.savefig('figure_kp_raw.eps')
-    elif evaluate_ki:
-        plt.title('Effet la variation de Ki avec '+ 'Kp = '+str(Kp)+' et Kd = '\
-                    +str(Kd) )
-        plt.savefig('figure_ki_raw.eps')
-    elif evaluate_kd:
-        plt.title('Effet la variation de Kd avec '+ 'Kp = '+str(Kp)+' et Ki = '\
-                +str(Ki))
-        plt.savefig('figure_kd_raw.eps')
-
-elif evaluate_ref:
-    for Ref in Ref_list:
-        legend.append('Cible = '+ str(Ref))
-        plt.plot([0, time], [Ref, Ref],'k--')
-    plt.legend(legend)
-    plt.title("Efficacité du contrôleur PID avec Kp = "+ str(Kp)+ ', '+'Ki = ' \
-                +str(Ki)+' et Kd = ' +str(Kd))
-    plt.savefig('figure_ref_raw.eps')
-
-elif evaluate:
-    plt.plot([0, time], [Ref, Ref],'k--')
-    plt.title("Efficacité du contrôleur PID avec Kp = "+ str(Kp)+ ', '+'Ki = ' \
-                +str(Ki)+' et Kd = ' +str(Kd))
-    plt.savefig('figure_PID_raw.eps')
-
-
-
-
+#************visualistion des données brutes et traitées**********************
+#les figures sont rendues ensemble par un groupe de processus
+specs = []
+for name, time_data, LEDs_data, subtitle in \
+        [('raw', time_raw, LEDs_vect, ''),\
+         ('clean', time_clean, LEDs_clean, '\n'+"(utilisation d'une moyenne glissante)")]:
+    spec = figure('', formats=('eps',))
+    #une seule spline pour toutes les courbes
+    time_new = np.linspace(0,time, 5*len(time_data))
+    for led_data in resample(time_data, LEDs_data, time_new):
+        plot(spec, time_new, led_data)
+    legend = []
+
+    if not evaluate_ref and not evaluate:
+        for K in K_list:
+            if evaluate_kp:
+                legend.append('Kp = '+ str(K))
+            elif evaluate_ki:
+                legend.append('Ki = '+ str(K))
+            elif evaluate_kd:
+                legend.append('Kd = '+ str(K))
+        plot(spec, [0, time], [Ref, Ref],'k--')
+        legend.append('Valeur cible')
+        spec['legend'] = legend
 
-#************visualistion des données traitées *******************************
-plt.figure()
-plt.xlabel('Temps (s)')
-plt.ylabel('Amplitude')
-for led_data in LEDs_clean:
-    f = interpolate.interp1d(time_clean, led_data, kind='cubic')
-    time_new = np.linspace(0,time, 5*len(time_clean))
-    plt.plot(time_new, f(time_new))
-legend = []
-
-if not evaluate_ref and not evaluate:
-    for K in K_list:
         if evaluate_kp:
-            legend.append('Kp = '+ str(K))
+            spec['title'] = 'Effet la variation de Kp avec '+ 'Ki = '+str(Ki)+' et Kd = '\
+                        +str(Kd) + subtitle
+            spec['name'] = 'figure_kp_' + name
         elif evaluate_ki:
-            legend.append('Ki = '+ str(K))
+            spec['title'] = 'Effet la variation de Ki avec '+ 'Kp = '+str(Kp)+' et Kd = '\
+                        +str(Kd) + subtitle
+            spec['name'] = 'figure_ki_' + name
         elif evaluate_kd:
-            legend.append('Kd = '+ str(K))
-
-    plt.plot([0, time], [Ref, Ref],'k--')
-    legend.append('Valeur cible')
-    plt.legend(legend)
-
-    if evaluate_kp:
-        plt.title('Effet la variation de Kp avec '+ 'Ki = '+str(Ki)+' et Kd = '\
-         +str(Kd) + '\n'+"(utilisation d'une moyenne glissante)")
-        plt.savefig('figure_kp_clean.eps')
-    elif evaluate_ki:
-        plt.title('Effet la variation de Ki avec '+ 'Kp = '+str(Kp)+' et Kd = '\
-        +str(Kd) + '\n'+"(utilisation d'une moyenne glissante)")
-        plt.savefig('figure_ki_clean.eps')
-    elif evaluate_kd:
-        plt.title('Effet la variation de Kd avec '+ 'Kp = '+str(Kp)+' et Ki = '\
-        +str(Ki)+ '\n'+"(utilisation d'une moyenne glissante)")
-        plt.savefig('figure_kd_clean.eps')
-
-elif evaluate_ref:
-    for Ref in Ref_list:
-        legend.append('Cible = '+ str(Ref))
-        plt.plot([0, time], [Ref, Ref],'k--')
-    plt.legend(legend)
-    plt.title("Efficacité du contrôleur PID avec Kp = " +str(Kp)+ ', ' +'Ki = '\
-    +str(Ki)+' et Kd = ' +str(Kd) + '\n'+"(utilisation d'une moyenne glissante)")
-    plt.savefig('figure_ref_clean.eps')
-
-elif evaluate:
-    plt.plot([0, time], [Ref, Ref],'k--')
-    plt.title("Efficacité du contrôleur PID avec Kp = "+ str(Kp)+ ', ' +'Ki = '\
-    +str(Ki)+' et Kd = ' +str(Kd)+ '\n'+"(utilisation d'une moyenne glissante)")
-    plt.savefig('figure_PID_clean.eps')
+            spec['title'] = 'Effet la variation de Kd avec '+ 'Kp = '+str(Kp)+' et Ki = '\
+                    +str(Ki) + subtitle
+            spec['name'] = 'figure_kd_' + name
+
+    elif evaluate_ref:
+        for Ref_value in Ref_list:
+            legend.append('Cible = '+ str(Ref_value))
+            plot(spec, [0, time], [Ref_value, Ref_value],'k--')
+        spec['legend'] = legend
+        spec['title'] = "Efficacité du contrôleur PID avec Kp = "+ str(Kp)+ ', '+'Ki = ' \
+                    +str(Ki)+' et Kd = ' +str(Kd) + subtitle
+        spec['name'] = 'figure_ref_' + name
+
+    elif evaluate:
+        plot(spec, [0, time], [Ref, Ref],'k--')
+        spec['title'] = "Efficacité du contrôleur PID avec Kp = "+ str(Kp)+ ', '+'Ki = ' \
+                    +str(Ki)+' et Kd = ' +str(Kd) + subtitle
+        spec['name'] = 'figure_PID_' + name
+    specs.append(spec)
+
+render_report(specs)
@@ -0,0 +1,68 @@
+"""
+Import time of the control modules: each module is imported in a new
+interpreter, which must not load matplotlib or scipy
+Polytechnique Montreal
+
+usage: python bench_import.py [module ...] [--budget seconds] [--repeat n]
+"""
+
+import subprocess
+import sys
+import os
+
+MODULES = ['PID_LED', 'PID_LED_v2', 'PID_devices', 'PID_multi', 'PID_acquisition']
+HEAVY = ('matplotlib', 'scipy')
+
+#run in the new interpreter: import time and heavy modules loaded
+PROBE = '''
+import sys, time
+t = time.perf_counter()
+import {module}
+t = time.perf_counter() - t
+heavy = sorted(name for name in sys.modules if name.split('.')[0] in {heavy!r})
+print(t, ' '.join(name for name in heavy if '.' not in name))
+'''
+
+
+
+def measure(module, repeat=5):
+    """
+    this function return the best import time of module over repeat new
+    interpreters and the heavy packages it loaded
+    """
+    best = None
+    for i in range(repeat):
+        result = subprocess.run([sys.executable, '-c', PROBE.format(module=module, heavy=HEAVY)],\
+                    capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        if result.returncode != 0:
+            raise RuntimeError("import of " + module + " failed:\n" + result.stderr)
+        t, *heavy = result.stdout.split()
+        best = float(t) if best is None else min(best, float(t))
+    return best, heavy
+
+
+
+def main(argv):
+    budget, repeat, modules = 0.5, 5, []
+    args = iter(argv)
+    for arg in args:
+        if arg == '--budget':
+            budget = float(next(args))
+        elif arg == '--repeat':
+            repeat = int(next(args))
+        else:
+            modules.append(arg)
+
+    failed = False
+    for module in modules or MODULES:
+        t, heavy = measure(module, repeat)
+        ok = t <= budget and not heavy
+        failed = failed or not ok
+        print('%-16s %8.1f ms  %s%s' % (module, 1e3*t, 'ok' if ok else 'FAIL',\
+                '  (loads ' + ', '.join(heavy) + ')' if heavy else ''))
+    return 1 if failed else 0
+
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))